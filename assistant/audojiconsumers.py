@@ -1,24 +1,99 @@
+import asyncio
 import json
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
 
+import orjson
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db.models import F
 
-from audojifactory.models import AudioFile, AudioSegment
+from audojiengine.logging_config import configure_logger
+from audojifactory.models import AudioFile, AudioSegment, SyncChange
+from audojifactory.notifications import (
+    add_subscriber,
+    encode_segment_batch,
+    parse_offset,
+    read_segment_events,
+    remove_subscriber,
+    segment_batch_frames,
+)
+from audojifactory.selection_cache import get_selected_segment_ids
 from audojifactory.serializers import AudioSegmentSerializerWebSocket
 
+logger = configure_logger(__name__)
+
+# Search-as-you-type: wait this long for the next keystroke before querying
+SEARCH_DEBOUNCE = 0.15  # seconds
+SEARCH_CACHE_SIZE = 32  # queries remembered per connection
+SEARCH_CACHE_TTL = 30  # seconds
+SEGMENT_PAYLOAD_CACHE_SIZE = 5000
+SEARCH_FILTERS = ("user_id", "title", "transcription", "category")
+
 
 class AudioSegmentConsumer(AsyncWebsocketConsumer):
+    # Frame formats a client can ask for with ?format=
+    # json: one text frame per segment (default)
+    # json-batch: one text frame per batch, {"segments": [...]}
+    # msgpack: one binary frame per batch, {"segments": [...]}
+    # Batch frames also carry an "offset", as does the last segment frame of a
+    # batch in the json format; reconnecting with ?offset=<offset> replays every
+    # batch sent after it.
+    # ?progress=1 adds pipeline progress frames, {"progress": {...}}, in the same
+    # encoding (text for the JSON formats, binary for msgpack).
+    # ?waveform=1 adds waveform_peaks to search results.
+    FRAME_FORMATS = ("json", "json-batch", "msgpack")
+
     async def connect(self):
-        # Retrieve the user_id from the query string
-        self.user_id = self.scope["query_string"].decode("utf-8").split("=")[1]
+        # Retrieve the user_id and the frame format from the query string
+        params = parse_qs(self.scope["query_string"].decode("utf-8"))
+        owner_ids = params.get("owner_id") or params.get("user_id")
+        if not owner_ids:
+            # Without an owner there is no group to join
+            self.group_name = None
+            await self.close()
+            return
+        self.user_id = owner_ids[0]
         self.group_name = f"user_{self.user_id}"
 
+        self.frame_format = params.get("format", ["json"])[0]
+        if self.frame_format not in self.FRAME_FORMATS:
+            self.frame_format = "json"
+        self.last_offset = None
+        self.wants_progress = params.get("progress", ["0"])[0] in ("1", "true")
+        self.wants_waveform = params.get("waveform", ["0"])[0] in ("1", "true")
+
+        self.search_task = None
+        self.search_results = OrderedDict()
+        self.segment_payloads = {}
+        self.last_result_ids = None
+
+        # Join the group before replaying so no batch falls between the two
+        await add_subscriber(self.group_name, self.channel_name)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
+        offset = params.get("offset", [None])[0]
+        if offset:
+            await self.replay_segments(offset)
+
     async def disconnect(self, close_code):
+        if self.group_name is None:
+            return
+        if self.search_task is not None:
+            self.search_task.cancel()
+
         # Remove this channel from the group
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await remove_subscriber(self.group_name, self.channel_name)
+
+    async def replay_segments(self, offset):
+        for event_offset, segments in await read_segment_events(
+            self.group_name, offset
+        ):
+            await self.send_segment_batch(encode_segment_batch(segments, event_offset))
+            self.last_offset = event_offset
 
     async def send_segment_update(self, message):
         # Call this method to send a message to the WebSocket
@@ -28,22 +103,167 @@ class AudioSegmentConsumer(AsyncWebsocketConsumer):
     # It will be called when a message with the type 'audio.segment' is sent to the group
     async def audio_segment(self, event):
         # Send the actual message
-        await self.send(text_data=json.dumps(event["message"]))
+        await self.send(text_data=orjson.dumps(event["message"]).decode())
+
+    # Handler for batched 'audio.segments' messages. The batch arrives as a
+    # msgpack frame; JSON frames are built from it once per process.
+    async def audio_segments(self, event):
+        # New segments can match any remembered query
+        self.search_results.clear()
+
+        # Skip batches already delivered by the replay on connect
+        offset = event.get("offset")
+        if offset and self.last_offset:
+            if parse_offset(offset) <= parse_offset(self.last_offset):
+                return
+        await self.send_segment_batch(event)
+
+    # Handler for 'audio.progress' stage events from the processing pipeline
+    async def audio_progress(self, event):
+        if not self.wants_progress:
+            return
+        if self.frame_format == "msgpack":
+            await self.send(bytes_data=event["progress_msgpack"])
+        else:
+            await self.send(text_data=event["progress_json"])
+
+    async def send_segment_batch(self, event):
+        if self.frame_format == "msgpack":
+            await self.send(bytes_data=event["batch_msgpack"])
+            return
+        for frame in segment_batch_frames(event["batch_msgpack"], self.frame_format):
+            await self.send(text_data=frame)
 
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        user_id = text_data_json.get("user_id")
-        title = text_data_json.get("title")
-        transcription = text_data_json.get("transcription")
-        category = text_data_json.get("category")
-
-        segments = await self.get_audio_segments(
-            user_id, title, transcription, category
-        )
-        await self.send(text_data=json.dumps({"segments": segments}))
+        query = json.loads(text_data)
+
+        # A newer query supersedes the one still debouncing or running
+        if self.search_task is not None:
+            self.search_task.cancel()
+        self.search_task = asyncio.create_task(self.search(query))
+
+    async def search(self, query):
+        try:
+            await asyncio.sleep(SEARCH_DEBOUNCE)
+
+            filters = tuple(query.get(name) or "" for name in SEARCH_FILTERS)
+            change_seq = await self.get_latest_change_seq(filters[0])
+            rows = self.get_cached_search_rows(filters, change_seq)
+            if rows is None:
+                rows = await self.get_search_rows(*filters)
+            self.search_results[filters] = (time.monotonic(), change_seq, rows)
+            self.search_results.move_to_end(filters)
+            while len(self.search_results) > SEARCH_CACHE_SIZE:
+                self.search_results.popitem(last=False)
+
+            selected_segment_ids = await get_selected_segment_ids(filters[0])
+            await self.send_search_results(query, rows, selected_segment_ids)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error searching audio segments: {e}")
+
+    def get_cached_search_rows(self, filters, change_seq):
+        """
+        Answer a query from an earlier result when possible.
+
+        An exact match is returned as is. A query that only extends the text
+        filters of a cached query (typing more characters) matches a subset of
+        that result, so it is narrowed in memory instead of hitting the database.
+        Results cached before the latest change (an edit, delete or new segment)
+        are not used.
+        """
+        now = time.monotonic()
+        for cached_filters, cached in reversed(self.search_results.items()):
+            cached_at, cached_change_seq, rows = cached
+            if now - cached_at > SEARCH_CACHE_TTL or cached_change_seq != change_seq:
+                continue
+            if cached_filters == filters:
+                return rows
+            if cached_filters[0] != filters[0]:
+                continue
+            if all(
+                old.lower() in new.lower()
+                for old, new in zip(cached_filters[1:], filters[1:])
+            ):
+                return [row for row in rows if matches_search_row(row, filters)]
+        return None
+
+    async def send_search_results(self, query, rows, selected_segment_ids):
+        if query.get("delta"):
+            # Only send what changed since this connection's previous result
+            previous_ids = self.last_result_ids or set()
+            result_ids = {row["id"] for row in rows}
+            added_rows = [row for row in rows if row["id"] not in previous_ids]
+            self.last_result_ids = result_ids
+            payload = {
+                "delta": True,
+                "count": len(rows),
+                "added": await self.get_segment_payloads(
+                    added_rows, selected_segment_ids
+                ),
+                "removed": list(previous_ids - result_ids),
+            }
+        elif query.get("page_size"):
+            try:
+                page = max(int(query.get("page", 1)), 1)
+                page_size = int(query["page_size"])
+            except (TypeError, ValueError):
+                page_size = 0
+            if page_size < 1:
+                await self.send(
+                    text_data=orjson.dumps(
+                        {"error": "page and page_size must be positive integers"}
+                    ).decode()
+                )
+                return
+            page_rows = rows[(page - 1) * page_size : page * page_size]
+            payload = {
+                "count": len(rows),
+                "page": page,
+                "segments": await self.get_segment_payloads(
+                    page_rows, selected_segment_ids
+                ),
+            }
+        else:
+            payload = {
+                "segments": await self.get_segment_payloads(rows, selected_segment_ids)
+            }
+
+        await self.send(text_data=orjson.dumps(payload).decode())
+
+    async def get_segment_payloads(self, rows, selected_segment_ids):
+        """Serialize rows, reusing payloads whose segment and file are unchanged."""
+        missing_ids = [
+            row["id"]
+            for row in rows
+            if self.segment_payloads.get(row["id"], (None,))[0] != row_version(row)
+        ]
+        if missing_ids:
+            cache_size = len(self.segment_payloads) + len(missing_ids)
+            if cache_size > SEGMENT_PAYLOAD_CACHE_SIZE:
+                self.segment_payloads.clear()
+            self.segment_payloads.update(await self.serialize_segments(missing_ids))
+
+        return [
+            {
+                **self.segment_payloads[row["id"]][1],
+                "is_selected": row["id"] in selected_segment_ids,
+            }
+            for row in rows
+            if row["id"] in self.segment_payloads
+        ]
 
     @database_sync_to_async
-    def get_audio_segments(self, user_id, title, transcription, category):
+    def get_latest_change_seq(self, user_id):
+        # Searches filter on the file owner, whose changes are logged under it
+        changes = SyncChange.objects.all()
+        if user_id:
+            changes = changes.filter(owner=user_id)
+        return changes.order_by("-id").values_list("id", flat=True).first() or 0
+
+    @database_sync_to_async
+    def get_search_rows(self, user_id, title, transcription, category):
         audio_files_query = AudioFile.objects.all()
 
         if user_id:
@@ -60,8 +280,51 @@ class AudioSegmentConsumer(AsyncWebsocketConsumer):
         if category:
             segments_query = segments_query.filter(category__name__icontains=category)
 
-        # Modify the serializer instantiation to include the user_id in the context
+        # Only the columns needed to narrow results and validate cached payloads
+        return list(
+            segments_query.values(
+                "id",
+                "change_seq",
+                "transcription",
+                title=F("audio_file__title"),
+                category_name=F("category__name"),
+                file_change_seq=F("audio_file__change_seq"),
+            )
+        )
+
+    @database_sync_to_async
+    def serialize_segments(self, segment_ids):
+        segments = list(
+            AudioSegment.objects.select_related("audio_file").filter(id__in=segment_ids)
+        )
+        # is_selected is filled in per result, so serialize without selections
         serializer = AudioSegmentSerializerWebSocket(
-            segments_query, many=True, context={"user_id": user_id}
+            segments,
+            many=True,
+            context={
+                "selected_segment_ids": frozenset(),
+                "waveform": self.wants_waveform,
+            },
         )
-        return serializer.data
+        return {
+            segment.id: (row_version(segment), data)
+            for segment, data in zip(segments, serializer.data)
+        }
+
+
+def row_version(row):
+    if isinstance(row, dict):
+        return row["change_seq"], row["file_change_seq"]
+    return row.change_seq, row.audio_file.change_seq
+
+
+def matches_search_row(row, filters):
+    user_id, title, transcription, category = filters
+    for value, field in (
+        (title, row["title"]),
+        (transcription, row["transcription"]),
+        (category, row["category_name"]),
+    ):
+        if value and value.lower() not in (field or "").lower():
+            return False
+    return True
@@ -24,9 +24,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.chat_engine = OpenAIChatEngine(
-            api_key=settings.OPENAI_API_KEY, assistant_id=settings.ASSISTANT_ID
-        )
+        self.chat_engine = OpenAIChatEngine(assistant_id=settings.ASSISTANT_ID)
 
     async def connect(self):
         """
@@ -1,28 +1,64 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import os
 
-# import openai
-from django.conf import settings
-from openai import OpenAI
+from asgiref.sync import sync_to_async
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.openai_client import openai_governor
+
+logger = configure_logger(__name__)
+
+# Assistant API calls share one limiter bucket and concurrency cap
+ASSISTANTS_LIMIT = "assistants"
+
+# Run states that can still change without any action from us
+PENDING_RUN_STATUSES = ("queued", "in_progress", "cancelling")
+RUN_POLL_INTERVAL = 0.5  # seconds, grown up to RUN_MAX_POLL_INTERVAL
+RUN_MAX_POLL_INTERVAL = 2.0
+RUN_TIMEOUT = 60  # seconds
+
+
+def read_upload(file_path):
+    with open(file_path, "rb") as file:
+        return os.path.basename(file_path), file.read()
 
 
 class OpenAIChatEngine:
-    def __init__(self, api_key, assistant_id):
-        self.client = OpenAI(api_key=api_key)
+    """
+    Assistants API chat on the shared AsyncOpenAI client, so a chat message
+    never blocks the event loop other sockets are served from. Every call goes
+    through openai_governor for the shared rate limit and retries.
+    """
+
+    def __init__(self, assistant_id):
         self.assistant_id = assistant_id
 
+    @property
+    def client(self):
+        # One pooled client per event loop, shared with the rest of the app
+        return openai_governor.client
+
+    async def call(self, func, *args, **kwargs):
+        return await openai_governor.call(ASSISTANTS_LIMIT, func, *args, **kwargs)
+
     async def upload_file(self, file_path):
-        with open(file_path, "rb") as file:
-            return self.client.files.create(file=file, purpose="assistants")
+        # Bytes rather than an open file, so a retry can send them again
+        upload = await sync_to_async(read_upload, thread_sensitive=False)(file_path)
+        return await self.call(
+            self.client.files.create, file=upload, purpose="assistants"
+        )
 
     async def delete_file(self, file_id, assistant_id):
-        self.client.files.delete(file_id=file_id)
-        self.client.beta.assistants.files.delete(
-            file_id=file_id, assistant_id=assistant_id
+        await self.call(self.client.files.delete, file_id=file_id)
+        await self.call(
+            self.client.beta.assistants.files.delete,
+            file_id=file_id,
+            assistant_id=assistant_id,
         )
 
     async def create_assistant(self, name, instructions, model, tools, file_id):
-        return self.client.beta.assistants.create(
+        return await self.call(
+            self.client.beta.assistants.create,
             name=name,
             instructions=instructions,
             model=model,
@@ -31,29 +67,34 @@ class OpenAIChatEngine:
         )
 
     async def attach_file_to_assistant(self, assistant_id, file_id):
-        self.client.beta.assistants.files.create(assistant_id, file_id=file_id)
+        await self.call(
+            self.client.beta.assistants.files.create, assistant_id, file_id=file_id
+        )
 
     async def create_thread(self):
-        thread = self.client.beta.threads.create()
+        thread = await self.call(self.client.beta.threads.create)
         return thread.id
 
     async def send_message(self, thread_id, message):
-        response = self.client.beta.threads.messages.create(
-            thread_id=thread_id, role="user", content=message
+        response = await self.call(
+            self.client.beta.threads.messages.create,
+            thread_id=thread_id,
+            role="user",
+            content=message,
         )
         return response.id
 
     async def process_run(self, thread_id, assistant_id):
-        run = self.client.beta.threads.runs.create(
+        return await self.call(
+            self.client.beta.threads.runs.create,
             thread_id=thread_id,
             assistant_id=assistant_id,
         )
-        return self.client.beta.threads.runs.retrieve(
-            thread_id=thread_id, run_id=run.id
-        )
 
-    async def get_messages(self, thread_id):
-        return self.client.beta.threads.messages.list(thread_id=thread_id)
+    async def get_messages(self, thread_id, limit=20):
+        return await self.call(
+            self.client.beta.threads.messages.list, thread_id=thread_id, limit=limit
+        )
 
     async def process_annotations(self, messages):
         message_content = messages.data[0].content[0].text
@@ -80,31 +121,33 @@ class OpenAIChatEngine:
         # message_content.value += '\n' + '\n'.join(citations)
         return message_content.value, citations
 
-    async def async_wrapper(func, *args, **kwargs):
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            return await loop.run_in_executor(pool, func, *args, **kwargs)
-
-    # async def wait_for_run_completion(self, thread_id, run_id, timeout=30, check_interval=2):
-    async def wait_for_run_completion(self, run, timeout=30, check_interval=2):
-        """Wait for the run to complete with a timeout."""
-        elapsed_time = 0
-        while elapsed_time < timeout:
-            if run.status == "completed":
-                return True
-            await asyncio.sleep(check_interval)
-            elapsed_time += check_interval
-        return False
+    async def wait_for_run_completion(self, run, timeout=RUN_TIMEOUT):
+        """Poll the run until it leaves the pending states or the timeout passes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = RUN_POLL_INTERVAL
+        while run.status in PENDING_RUN_STATUSES and loop.time() < deadline:
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, RUN_MAX_POLL_INTERVAL)
+            run = await self.call(
+                self.client.beta.threads.runs.retrieve,
+                thread_id=run.thread_id,
+                run_id=run.id,
+            )
+        if run.status != "completed":
+            logger.warning(f"Run {run.id} ended as {run.status}")
+        return run.status == "completed"
 
     async def handle_chat(self, thread_id, message):
         message_id = await self.send_message(thread_id, message)
         run = await self.process_run(thread_id, self.assistant_id)
         await self.wait_for_run_completion(run)
-        messages = await self.get_messages(thread_id)
+        # Newest first: the assistant's reply
+        messages = await self.get_messages(thread_id, limit=1)
         processed_message, citations = await self.process_annotations(messages)
         return processed_message, citations, message_id
 
 
 # Example usage
-# chat_engine = OpenAIChatEngine()
+# chat_engine = OpenAIChatEngine(assistant_id)
 # final_text = chat_engine.handle_chat("Your user's initial message")
@@ -1,3 +1,59 @@
+from collections import OrderedDict
+from unittest import mock
+
+import orjson
+from asgiref.sync import async_to_sync
 from django.test import TestCase
 
-# Create your tests here.
+from assistant.audojiconsumers import AudioSegmentConsumer
+from audojifactory.models import AudioFile, AudioSegment
+
+
+@mock.patch("assistant.audojiconsumers.SEARCH_DEBOUNCE", 0)
+@mock.patch(
+    "assistant.audojiconsumers.get_selected_segment_ids",
+    mock.AsyncMock(return_value=set()),
+)
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        audio_file = AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Song", audio_file="song.mp3"
+        )
+        self.segment = AudioSegment.objects.create(
+            audio_file=audio_file,
+            start_time=0.0,
+            end_time=2.0,
+            transcription="hello there",
+            segment_file="audio_segments/song/segment_1.mp3",
+        )
+
+        self.consumer = AudioSegmentConsumer()
+        self.consumer.search_results = OrderedDict()
+        self.consumer.segment_payloads = {}
+        self.consumer.last_result_ids = None
+        self.consumer.wants_waveform = False
+        self.consumer.send = mock.AsyncMock()
+
+    def search(self, **query):
+        async_to_sync(self.consumer.search)({"user_id": "user-1", **query})
+        payload = orjson.loads(self.consumer.send.call_args.kwargs["text_data"])
+        return [segment["id"] for segment in payload["segments"]]
+
+    def test_repeated_search_is_served_from_the_cache(self):
+        self.assertEqual(self.search(transcription="hello"), [self.segment.id])
+        with mock.patch.object(self.consumer, "get_search_rows") as get_search_rows:
+            self.assertEqual(self.search(transcription="hello"), [self.segment.id])
+        get_search_rows.assert_not_called()
+
+    def test_edited_segment_is_not_served_from_a_cached_result(self):
+        self.assertEqual(self.search(transcription="hello"), [self.segment.id])
+
+        self.segment.transcription = "goodbye"
+        self.segment.save()
+        self.assertEqual(self.search(transcription="hello"), [])
+
+    def test_deleted_segment_is_not_served_from_a_cached_result(self):
+        self.assertEqual(self.search(transcription="hello"), [self.segment.id])
+
+        self.segment.delete()
+        self.assertEqual(self.search(transcription="hello"), [])
@@ -0,0 +1,146 @@
+import asyncio
+import atexit
+import functools
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from celery import shared_task
+from celery.signals import worker_process_shutdown
+from django.db import close_old_connections
+
+from audojiengine.logging_config import configure_logger
+
+logger = configure_logger(__name__)
+
+
+class AsyncRuntime:
+    """
+    One long-lived event loop per process, running on a daemon thread.
+
+    Coroutines from sync code (Celery tasks, helper threads) are submitted to this
+    loop instead of a fresh ``asyncio.new_event_loop()`` per call, so pooled async
+    resources bound to the loop (HTTP connection pools, OpenAI clients, Redis and
+    channel-layer connections) survive from one task to the next. The loop is
+    recreated in a forked child, since a parent's loop thread does not survive
+    the fork.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.drain_callbacks = []
+
+    def get_loop(self):
+        with self.lock:
+            if self.loop is None or self.pid != os.getpid():
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(
+                    target=self.run_loop,
+                    args=(self.loop,),
+                    name="async-runtime",
+                    daemon=True,
+                )
+                self.thread.start()
+                self.pid = os.getpid()
+            return self.loop
+
+    @staticmethod
+    def run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the runtime loop and return a concurrent Future."""
+        loop = self.get_loop()
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("Cannot block on the async runtime from its own loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the runtime loop and block until it returns."""
+        return self.submit(coro).result(timeout)
+
+    def on_drain(self, callback):
+        """Register an ``async`` callback to await on shutdown, before cancelling."""
+        self.drain_callbacks.append(callback)
+
+    def shutdown(self, timeout=10):
+        with self.lock:
+            loop, thread = self.loop, self.thread
+            if loop is None or self.pid != os.getpid():
+                return
+            self.loop = self.thread = self.pid = None
+
+        async def run_drain_callbacks():
+            # In registration order, so queued work can still feed later buffers
+            for callback in self.drain_callbacks:
+                await callback()
+
+        async def drain():
+            try:
+                await asyncio.wait_for(run_drain_callbacks(), timeout)
+            except asyncio.TimeoutError:
+                logger.error("Timed out draining async runtime work")
+
+            current = asyncio.current_task()
+            pending = [task for task in asyncio.all_tasks() if task is not current]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(drain(), loop).result(2 * timeout)
+        except Exception as e:
+            logger.error(f"Error draining async runtime: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+
+runtime = AsyncRuntime()
+
+
+def run_async(coro, timeout=None):
+    return runtime.run(coro, timeout)
+
+
+def async_task(*task_args, **task_kwargs):
+    """
+    Register an ``async def`` function as a Celery shared task that runs on the
+    worker's persistent event loop.
+
+        @async_task()
+        async def task_do_something(arg):
+            ...
+    """
+
+    def decorator(coro_func):
+        async def run_task(*args, **kwargs):
+            try:
+                return await coro_func(*args, **kwargs)
+            finally:
+                # The loop's ORM thread outlives the task, so recycle its
+                # connection the way Celery does for the worker thread
+                await sync_to_async(close_old_connections)()
+
+        @functools.wraps(coro_func)
+        def task(*args, **kwargs):
+            return run_async(run_task(*args, **kwargs))
+
+        return shared_task(*task_args, **task_kwargs)(task)
+
+    return decorator
+
+
+@worker_process_shutdown.connect
+def shutdown_async_runtime(**kwargs):
+    runtime.shutdown()
+
+
+# Web processes (daphne) have no worker signal; drain on interpreter exit instead
+atexit.register(runtime.shutdown)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+from django.conf import settings
+
+from audojiengine.async_runtime import runtime
+from audojiengine.logging_config import configure_logger
+
+logger = configure_logger(__name__)
+
+
+class BackgroundQueue:
+    """
+    A bounded queue of fire-and-forget coroutines, run by a fixed number of
+    worker tasks on the process's async runtime loop.
+
+    ``submit`` waits while the queue is full, so a burst of requests is slowed
+    down instead of piling up unbounded work. Pending work is drained before the
+    runtime loop stops on shutdown. Every ``stats_interval`` seconds (0 to turn
+    it off) the queue's stats are logged, unless it has been idle.
+    """
+
+    def __init__(self, name, workers, maxsize, stats_interval=0):
+        self.name = name
+        self.workers = workers
+        self.maxsize = maxsize
+        self.stats_interval = stats_interval
+        self.loop = None
+        self.queue = None
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.high_water = 0
+        runtime.on_drain(self.drain)
+
+    def ensure_started(self):
+        # Queue and workers belong to the runtime loop, which is recreated after fork
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue(self.maxsize)
+            for _ in range(self.workers):
+                loop.create_task(self.work())
+            if self.stats_interval:
+                loop.create_task(self.report_stats())
+
+    async def put(self, coro_func, args):
+        self.ensure_started()
+        if self.queue.full():
+            logger.warning(f"{self.name} queue is full, waiting: {self.stats()}")
+        await self.queue.put((coro_func, args))
+        self.submitted += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+
+    async def submit(self, coro_func, *args):
+        """Queue ``coro_func(*args)``, waiting while the queue is full."""
+        if threading.current_thread() is runtime.thread:
+            await self.put(coro_func, args)
+        else:
+            await asyncio.wrap_future(runtime.submit(self.put(coro_func, args)))
+
+    async def work(self):
+        while True:
+            coro_func, args = await self.queue.get()
+            self.running += 1
+            try:
+                await coro_func(*args)
+                self.completed += 1
+            except Exception:
+                self.failed += 1
+                logger.error(
+                    f"{self.name} job {coro_func.__name__} failed", exc_info=True
+                )
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def report_stats(self):
+        last_submitted = None
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            stats = self.stats()
+            if stats["submitted"] != last_submitted or stats["running"]:
+                logger.info(f"{self.name} queue: {stats}")
+            last_submitted = stats["submitted"]
+
+    async def drain(self):
+        if self.queue is None or self.loop is not asyncio.get_running_loop():
+            return
+        if self.queue.qsize() or self.running:
+            logger.info(f"Draining {self.name} queue: {self.stats()}")
+        await self.queue.join()
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "maxsize": self.maxsize,
+            "running": self.running,
+            "high_water": self.high_water,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Side-writes made on behalf of web requests (e.g. the Mongo audio metadata copy)
+side_writes = BackgroundQueue(
+    "side-writes",
+    workers=settings.BACKGROUND_WRITE_WORKERS,
+    maxsize=settings.BACKGROUND_WRITE_QUEUE_SIZE,
+    stats_interval=settings.BACKGROUND_STATS_INTERVAL,
+)
@@ -0,0 +1,23 @@
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+# Like the Redis clients, httpx connection pools are bound to the event loop that
+# opened them, so keep one client per loop
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+            ),
+            follow_redirects=True,
+        )
+        _clients[loop] = client
+    return client
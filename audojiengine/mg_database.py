@@ -1,36 +1,178 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pymongo
 from django.conf import settings
 
+from audojiengine.async_runtime import runtime
 from audojiengine.logging_config import configure_logger
 
 logger = configure_logger(__name__)
 
+MAX_BATCH_SIZE = 100
+MAX_BATCH_DELAY = 1.0  # seconds
+
+
+def create_client(url):
+    # "mongomock://" gives an in-memory stand-in for local runs and tests
+    if url.startswith("mongomock://"):
+        import mongomock
+
+        return mongomock.MongoClient()
+    return pymongo.MongoClient(url)
+
+
 # Initialize a MongoDB client
-client = pymongo.MongoClient(settings.MONGO_DB_URL)
+client = create_client(settings.MONGO_DB_URL)
 db = client[settings.MONGO_DB_NAME]
 
+# pymongo blocks, so its calls run on a small dedicated pool instead of the loop
+mongo_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mongo")
+
+
+class MongoWriteBuffer:
+    """
+    Write-behind buffer for one collection.
+
+    Documents are collected on the async runtime loop and written with a single
+    unordered ``insert_many`` once ``max_batch_size`` are pending or
+    ``max_batch_delay`` seconds have passed since the first one. Whatever is
+    still buffered is flushed when the runtime shuts down.
+    """
+
+    def __init__(
+        self,
+        collection_name,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_batch_delay=MAX_BATCH_DELAY,
+        ordered=False,
+    ):
+        self.collection_name = collection_name
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.ordered = ordered
+        self.loop = None
+        self.pending = []
+        self.flush_lock = None
+        self.flush_timer = None
+        self.flushes = 0
+        self.documents_written = 0
+        self.write_errors = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        runtime.on_drain(self.close)
+
+    def ensure_started(self):
+        # Buffer state belongs to the runtime loop, which is recreated after fork
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.pending = []
+            self.flush_lock = asyncio.Lock()
+            self.flush_timer = None
+
+    async def add(self, document):
+        if threading.current_thread() is not runtime.thread:
+            await asyncio.wrap_future(runtime.submit(self.add(document)))
+            return
+
+        self.ensure_started()
+        self.pending.append(document)
+        if len(self.pending) >= self.max_batch_size:
+            await self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.create_task(self.flush_after_delay())
+
+    async def flush_after_delay(self):
+        await asyncio.sleep(self.max_batch_delay)
+        self.flush_timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            documents, self.pending = self.pending, []
+
+            start_time = time.perf_counter()
+            try:
+                inserted = await asyncio.get_running_loop().run_in_executor(
+                    mongo_executor, self.insert_many, documents
+                )
+            except Exception as e:
+                # Flushes run from an unawaited timer task; nothing else would
+                # ever see this batch's failure
+                logger.error(
+                    f"Could not flush {len(documents)} documents to "
+                    f"{self.collection_name}: {e}"
+                )
+                inserted = 0
+            elapsed = time.perf_counter() - start_time
+
+            self.flushes += 1
+            self.documents_written += inserted
+            self.write_errors += len(documents) - inserted
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            logger.info(
+                f"Flushed {inserted}/{len(documents)} documents to "
+                f"{self.collection_name} in {elapsed:.3f}s"
+            )
+
+    def insert_many(self, documents):
+        """Insert a batch and return how many documents were written."""
+        try:
+            db[self.collection_name].insert_many(documents, ordered=self.ordered)
+            return len(documents)
+        except pymongo.errors.BulkWriteError as e:
+            # Unordered inserts keep going past bad documents
+            logger.error(
+                f"MongoDB bulk write to {self.collection_name} failed for "
+                f"{len(e.details['writeErrors'])} documents"
+            )
+            return e.details["nInserted"]
+        except pymongo.errors.PyMongoError as e:
+            logger.error(f"MongoDB error: {e}")
+            return 0
+
+    async def close(self):
+        """Cancel the pending timer and write whatever is still buffered."""
+        if self.loop is not asyncio.get_running_loop():
+            return
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "flushes": self.flushes,
+            "documents_written": self.documents_written,
+            "write_errors": self.write_errors,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / (self.flushes or 1),
+        }
+
+
+audio_file_writes = MongoWriteBuffer("audio_files")
+audio_segment_writes = MongoWriteBuffer("audio_segments")
+
 
 async def store_data_to_audio_segment_mgdb(segment_data):
-    try:
-        # # Replace 'your_collection_name' with your actual collection name
-        # collection = db["your_collection_name"]
-        # # Insert the document into MongoDB
-        # collection.insert_one(segment_data)
-        logger.info("Data stored in MongoDB successfully.")
-    except pymongo.errors.PyMongoError as e:
-        logger.error(f"MongoDB error: {e}")
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
+    if not settings.MONGO_METADATA_WRITES:
+        logger.info("MongoDB metadata writes are disabled; segment not stored.")
+        return
+    await audio_segment_writes.add(segment_data)
 
 
 async def store_data_to_audio_mgdb(segment_data):
-    try:
-        #     # Replace 'your_collection_name' with your actual collection name
-        #     collection = db["your_collection_name"]
-        #     # Insert the document into MongoDB
-        #     collection.insert_one(segment_data)
-        logger.info("Data stored in MongoDB successfully.")
-    except pymongo.errors.PyMongoError as e:
-        logger.error(f"MongoDB error: {e}")
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
+    if not settings.MONGO_METADATA_WRITES:
+        logger.info("MongoDB metadata writes are disabled; audio file not stored.")
+        return
+    await audio_file_writes.add(segment_data)
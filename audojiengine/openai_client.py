@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import random
+import weakref
+
+import openai
+import redis
+from django.conf import settings
+from openai import AsyncOpenAI
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.redis_client import get_redis
+
+logger = configure_logger(__name__)
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_CAP = 30.0  # seconds
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Two token buckets per model, shared by every worker: requests and tokens per
+# minute. Takes the cost from both when both can cover it and returns "0",
+# otherwise takes nothing and returns the seconds until they could.
+# KEYS = [requests bucket, tokens bucket]
+# ARGV = [requests per minute, tokens per minute, requests, tokens]
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[i])
+    local cost = tonumber(ARGV[i + 2])
+    local bucket = redis.call("HMGET", KEYS[i], "level", "ts")
+    local level = tonumber(bucket[1]) or capacity
+    local elapsed = now - (tonumber(bucket[2]) or now)
+    level = math.min(capacity, level + elapsed * capacity / 60)
+    levels[i] = level
+    if cost > level then
+        wait = math.max(wait, (cost - level) * 60 / capacity)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, 2 do
+    local level = math.min(tonumber(ARGV[i]), levels[i] - tonumber(ARGV[i + 2]))
+    redis.call("HSET", KEYS[i], "level", tostring(level), "ts", tostring(now))
+    redis.call("EXPIRE", KEYS[i], 120)
+end
+return "0"
+"""
+
+
+def get_model_limits(model):
+    return settings.OPENAI_MODEL_LIMITS.get(model, settings.OPENAI_DEFAULT_LIMITS)
+
+
+def estimate_chat_tokens(request):
+    """Upper bound on a chat completion's tokens: ~4 characters per prompt token."""
+    prompt_characters = sum(
+        len(message.get("content") or "") for message in request["messages"]
+    )
+    return prompt_characters // 4 + request.get("max_tokens", 1000)
+
+
+def backoff_delay(attempt, error):
+    # Honour the server's hint on 429s (up to BACKOFF_CAP), otherwise exponential
+    # backoff with full jitter
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = min(max(float(retry_after), 0.0), BACKOFF_CAP)
+            return delay + random.uniform(0, BACKOFF_BASE)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+
+class OpenAIGovernor:
+    """
+    Single entry point for OpenAI calls.
+
+    Each call waits for a per-model concurrency slot in this process, then for
+    room in the model's requests- and tokens-per-minute buckets in Redis, which
+    every worker shares. Rate limits, connection errors and 5xx responses are
+    retried with jittered backoff; the SDK's own retries are disabled so every
+    attempt goes through the limiter. Clients and semaphores are kept per event
+    loop, like the Redis clients.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self.clients = weakref.WeakKeyDictionary()
+        self.semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+            self.clients[loop] = client
+        return client
+
+    def get_semaphore(self, model):
+        semaphores = self.semaphores.setdefault(asyncio.get_running_loop(), {})
+        if model not in semaphores:
+            concurrency = get_model_limits(model)["concurrency"]
+            semaphores[model] = asyncio.Semaphore(concurrency)
+        return semaphores[model]
+
+    async def reserve(self, model, requests=1, tokens=0):
+        """Take from the model's shared request and token buckets, waiting if needed."""
+        limits = get_model_limits(model)
+        # A request larger than the bucket could never be admitted
+        tokens = min(tokens, limits["tpm"])
+        while True:
+            try:
+                wait = float(
+                    await get_redis().eval(
+                        TOKEN_BUCKET_SCRIPT,
+                        2,
+                        f"openai:bucket:{model}:requests",
+                        f"openai:bucket:{model}:tokens",
+                        limits["rpm"],
+                        limits["tpm"],
+                        requests,
+                        tokens,
+                    )
+                )
+            except redis.RedisError as e:
+                # Fail open: the per-worker concurrency cap still applies
+                logger.error(f"OpenAI rate limiter unavailable: {e}")
+                return
+            if wait <= 0:
+                return
+            # Jitter so waiting workers don't all retry at the same instant
+            await asyncio.sleep(wait + random.uniform(0, 0.1))
+
+    @contextlib.asynccontextmanager
+    async def limit(self, model, tokens=0):
+        async with self.get_semaphore(model):
+            await self.reserve(model, tokens=tokens)
+            yield
+
+    async def call(self, model, func, *args, estimated_tokens=0, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.limit(model, estimated_tokens):
+                    response = await func(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, e)
+                logger.warning(
+                    f"OpenAI {model} call failed ({type(e).__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            await self.settle(model, estimated_tokens, response)
+            return response
+
+    async def settle(self, model, estimated_tokens, response):
+        # Give back what the estimate over-reserved once real usage is known
+        usage = getattr(response, "usage", None)
+        used_tokens = getattr(usage, "total_tokens", None)
+        if used_tokens is not None and used_tokens < estimated_tokens:
+            await self.reserve(model, requests=0, tokens=used_tokens - estimated_tokens)
+
+    async def create_chat_completion(self, **kwargs):
+        return await self.call(
+            kwargs["model"],
+            self.client.chat.completions.create,
+            estimated_tokens=estimate_chat_tokens(kwargs),
+            **kwargs,
+        )
+
+    async def create_transcription(self, **kwargs):
+        # Pass the file as bytes or a (name, bytes) tuple so retries can resend it
+        return await self.call(
+            kwargs["model"], self.client.audio.transcriptions.create, **kwargs
+        )
+
+
+openai_governor = OpenAIGovernor()
@@ -0,0 +1,18 @@
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+# redis.asyncio connections are bound to the event loop that opened them, so keep
+# one client per loop rather than a single module-level client
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(settings.REDIS_URL)
+        _clients[loop] = client
+    return client
@@ -1,3 +1,4 @@
+import json
 import os
 import secrets
 from datetime import timedelta
@@ -203,15 +204,98 @@ SPECTACULAR_SETTINGS = {
 }
 
 # ==> MONGO DB
+# "mongomock://" selects an in-memory stand-in for tests and local runs
 MONGO_DB_URL = config("MONGO_DB_URL")
 MONGO_DB_NAME = config("MONGO_DB_NAME")
+# Upload metadata is only written to the audio_files/audio_segments collections
+# when enabled; off by default, as before the write buffer existed
+MONGO_METADATA_WRITES = config("MONGO_METADATA_WRITES", default=False, cast=bool)
 # ================================ CUSTOM CONFIGS =======================================
 
 # ================================ CUSTOM VARIABLES =======================================
 # ==> OPENAI
 OPENAI_API_KEY = config("OPENAI_API_KEY")
 ASSISTANT_ID = config("ASSISTANT_ID")
+# Requests/tokens per minute are shared by all workers through Redis;
+# concurrency is the cap on in-flight calls per worker process. Both settings
+# can be replaced with JSON of the same shape from the environment.
+OPENAI_DEFAULT_LIMITS = config(
+    "OPENAI_DEFAULT_LIMITS",
+    default=json.dumps({"rpm": 500, "tpm": 150000, "concurrency": 8}),
+    cast=json.loads,
+)
+OPENAI_MODEL_LIMITS = config(
+    "OPENAI_MODEL_LIMITS",
+    default=json.dumps(
+        {
+            "gpt-4-turbo": {"rpm": 500, "tpm": 300000, "concurrency": 8},
+            "gpt-4-1106-preview": {"rpm": 500, "tpm": 300000, "concurrency": 8},
+            "whisper-1": {"rpm": 50, "tpm": 1000000, "concurrency": 4},
+            "assistants": {"rpm": 300, "tpm": 1000000, "concurrency": 8},
+        }
+    ),
+    cast=json.loads,
+)
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
 MODEL_SIZE = config("MODEL_SIZE")
+# Transcription backend for uploads without a known ?model_type= (api, os, fast)
+DEFAULT_TRANSCRIPTION_BACKEND = config("DEFAULT_TRANSCRIPTION_BACKEND", default="api")
+# CPU threads per faster-whisper model; 0 lets CTranslate2 decide
+FASTER_WHISPER_CPU_THREADS = config("FASTER_WHISPER_CPU_THREADS", default=0, cast=int)
+
+# ==> AUDIO PIPELINE
+# Scratch space shared by the pipeline workers for stage hand-offs
+PIPELINE_SCRATCH_DIR = config("PIPELINE_SCRATCH_DIR", default=str(BASE_DIR / "scratch"))
+# Fair scheduling: jobs admitted at once, overall and per user
+PIPELINE_MAX_RUNNING_JOBS = config("PIPELINE_MAX_RUNNING_JOBS", default=20, cast=int)
+PIPELINE_MAX_RUNNING_JOBS_PER_USER = config(
+    "PIPELINE_MAX_RUNNING_JOBS_PER_USER", default=2, cast=int
+)
+# Seconds an admitted job holds its slot without finishing a stage
+PIPELINE_JOB_LEASE = config("PIPELINE_JOB_LEASE", default=2 * 60 * 60, cast=int)
+# Seconds between periodic admission passes, which reclaim expired leases
+PIPELINE_DISPATCH_INTERVAL = config("PIPELINE_DISPATCH_INTERVAL", default=60, cast=int)
+# Segment files of one song uploaded to storage at once
+PIPELINE_UPLOAD_CONCURRENCY = config("PIPELINE_UPLOAD_CONCURRENCY", default=8, cast=int)
+
+# ==> DELTA SYNC
+# Changes younger than this are held back from the sync feed, so a change whose
+# transaction commits after a higher id is still served past the cursor
+SYNC_CHANGE_SETTLE_SECONDS = config("SYNC_CHANGE_SETTLE_SECONDS", default=5, cast=int)
+
+# ==> BACKGROUND WRITES
+# Per-process worker tasks and queue bound for request side-writes
+BACKGROUND_WRITE_WORKERS = config("BACKGROUND_WRITE_WORKERS", default=4, cast=int)
+BACKGROUND_WRITE_QUEUE_SIZE = config("BACKGROUND_WRITE_QUEUE_SIZE", default=100, cast=int)
+# Seconds between queue depth/throughput log lines per process; 0 turns them off
+BACKGROUND_STATS_INTERVAL = config("BACKGROUND_STATS_INTERVAL", default=60, cast=int)
+
+# ==> SEGMENT RENDITIONS
+# Total size of transcoded renditions kept in storage before LRU eviction
+RENDITION_CACHE_BYTES = config("RENDITION_CACHE_BYTES", default=5 * 1024**3, cast=int)
+# Selections after which a segment's low-bandwidth renditions are made eagerly
+RENDITION_POPULAR_SELECTIONS = config(
+    "RENDITION_POPULAR_SELECTIONS", default=20, cast=int
+)
+
+# ==> MEDIA URLS
+# Signed media URLs remembered per process (audojiengine.storage_backends)
+MEDIA_URL_CACHE_SIZE = config("MEDIA_URL_CACHE_SIZE", default=50000, cast=int)
+# Serve media through CloudFront with signed cookies instead of signed URLs
+MEDIA_SIGNED_COOKIES = config("MEDIA_SIGNED_COOKIES", default=False, cast=bool)
+MEDIA_COOKIE_DOMAIN = config("MEDIA_COOKIE_DOMAIN", default=None)
+MEDIA_COOKIE_LIFETIME = config("MEDIA_COOKIE_LIFETIME", default=6 * 60 * 60, cast=int)
+# Uploads above the threshold go to S3 as multipart uploads of chunk-size parts
+MEDIA_MULTIPART_THRESHOLD = config(
+    "MEDIA_MULTIPART_THRESHOLD", default=8 * 1024 * 1024, cast=int
+)
+MEDIA_MULTIPART_CHUNKSIZE = config(
+    "MEDIA_MULTIPART_CHUNKSIZE", default=8 * 1024 * 1024, cast=int
+)
+
+# ==> HTTP CLIENT
+# Seconds to connect, and to wait for each read, when downloading media
+HTTP_CONNECT_TIMEOUT = config("HTTP_CONNECT_TIMEOUT", default=10.0, cast=float)
+HTTP_READ_TIMEOUT = config("HTTP_READ_TIMEOUT", default=120.0, cast=float)
 # ================================ CUSTOM VARIABLES =======================================
@@ -81,6 +81,9 @@ STATIC_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/{AWS_LOCATION}/"
 #     }
 # }
 
+# ==> REDIS
+REDIS_URL = config("REDIS_URL")
+
 # ==> CHANNELS
 default_channel_layer = {
     "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -105,6 +108,25 @@ CELERY_IMPORTS = ("audojiengine.tasks",)
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+
+# Per-stage queues for the audio processing pipeline (audojifactory.tasks)
+CELERY_TASK_ROUTES = {
+    "audojifactory.tasks.stage_fetch": {"queue": "audoji.fetch"},
+    "audojifactory.tasks.stage_transcribe": {"queue": "audoji.transcribe"},
+    "audojifactory.tasks.stage_refine": {"queue": "audoji.encode"},
+    "audojifactory.tasks.stage_categorize": {"queue": "audoji.categorize"},
+    "audojifactory.tasks.stage_encode": {"queue": "audoji.encode"},
+    "audojifactory.tasks.stage_upload": {"queue": "audoji.upload"},
+    "audojifactory.tasks.stage_notify": {"queue": "audoji.notify"},
+}
+
+# Run by `celery -A audojiengine beat`
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-pipeline-jobs": {
+        "task": "audojifactory.tasks.task_dispatch_pipeline_jobs",
+        "schedule": PIPELINE_DISPATCH_INTERVAL,
+    },
+}
 # ================================ CELERY =======================================
 
 
@@ -1,3 +1,12 @@
+import base64
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from boto3.s3.transfer import TransferConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from storages.backends.s3boto3 import S3Boto3Storage
 
 # class StaticStorage(S3Boto3Storage):
@@ -6,6 +15,100 @@ from storages.backends.s3boto3 import S3Boto3Storage
 
 
 class MediaStorage(S3Boto3Storage):
+    """
+    Private media. Signed URLs are cached per object key and expiry bucket, so a
+    list response signs each file at most once per half expiry period instead
+    of once per row and request. ``urls`` signs a whole page's files at once.
+
+    With MEDIA_SIGNED_COOKIES, files are served through the CloudFront domain
+    (AWS_S3_CUSTOM_DOMAIN) as plain URLs and access is granted by the cookies
+    from ``signed_cookies``, so no URL is signed at all.
+    """
+
     location = "media"
     default_acl = "private"
     file_overwrite = False
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault(
+            "transfer_config",
+            TransferConfig(
+                multipart_threshold=settings.MEDIA_MULTIPART_THRESHOLD,
+                multipart_chunksize=settings.MEDIA_MULTIPART_CHUNKSIZE,
+            ),
+        )
+        super().__init__(**kwargs)
+        self.signed_cookies_enabled = settings.MEDIA_SIGNED_COOKIES
+        if self.signed_cookies_enabled:
+            if not (self.custom_domain and self.cloudfront_signer):
+                raise ImproperlyConfigured(
+                    "MEDIA_SIGNED_COOKIES needs AWS_S3_CUSTOM_DOMAIN set to the "
+                    "CloudFront domain, AWS_CLOUDFRONT_KEY_ID and AWS_CLOUDFRONT_KEY."
+                )
+            # Plain CloudFront URLs; the cookies carry the signature
+            self.querystring_auth = False
+        self.url_cache = OrderedDict()
+        self.url_cache_size = settings.MEDIA_URL_CACHE_SIZE
+        self.url_cache_lock = threading.Lock()
+
+    def expiry_bucket(self):
+        # A URL signed in a bucket is served until the bucket ends, so it stays
+        # valid for at least half of querystring_expire after it is handed out
+        return int(time.time() // max(self.querystring_expire // 2, 1))
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if parameters or http_method or expire is not None:
+            return super().url(name, parameters, expire, http_method)
+        return self.urls([name])[name]
+
+    def urls(self, names):
+        """Return {name: url} for many files, signing only the uncached ones."""
+        bucket = self.expiry_bucket()
+        urls = {}
+        with self.url_cache_lock:
+            for name in names:
+                url = self.url_cache.get((name, bucket))
+                if url is not None:
+                    self.url_cache.move_to_end((name, bucket))
+                    urls[name] = url
+
+        missing = [name for name in dict.fromkeys(names) if name not in urls]
+        signed = {name: super(MediaStorage, self).url(name) for name in missing}
+        urls.update(signed)
+
+        if signed:
+            with self.url_cache_lock:
+                for name, url in signed.items():
+                    self.url_cache[(name, bucket)] = url
+                while len(self.url_cache) > self.url_cache_size:
+                    self.url_cache.popitem(last=False)
+        return urls
+
+    def signed_cookies(self, lifetime):
+        """
+        CloudFront signed cookies granting access to every media file for
+        ``lifetime`` seconds. Returns (cookies, expires_at).
+        """
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=lifetime)
+        resource = f"{self.url_protocol}//{self.custom_domain}/{self.location}/*"
+        policy = self.cloudfront_signer.build_policy(
+            resource, date_less_than=expires_at
+        ).encode("utf8")
+        signature = self.cloudfront_signer.rsa_signer(policy)
+        cookies = {
+            "CloudFront-Policy": cloudfront_b64encode(policy),
+            "CloudFront-Signature": cloudfront_b64encode(signature),
+            "CloudFront-Key-Pair-Id": self.cloudfront_key_id,
+        }
+        return cookies, expires_at
+
+
+def cloudfront_b64encode(data):
+    # CloudFront's URL-safe base64 alphabet
+    return (
+        base64.b64encode(data)
+        .replace(b"+", b"-")
+        .replace(b"=", b"_")
+        .replace(b"/", b"~")
+        .decode("utf8")
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from audojiengine import mg_database
+from audojiengine.async_runtime import AsyncRuntime, run_async
+from audojiengine.background import BackgroundQueue
+from audojiengine.mg_database import MongoWriteBuffer
+from audojiengine.openai_client import BACKOFF_BASE, BACKOFF_CAP, backoff_delay
+
+
+class MongoWriteBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mg_database.create_client("mongomock://")["test"]
+        patcher = mock.patch("audojiengine.mg_database.db", self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, buffer, *documents):
+        for document in documents:
+            run_async(buffer.add(document))
+
+    def test_flushes_when_the_batch_is_full(self):
+        buffer = MongoWriteBuffer("segments", max_batch_size=3, max_batch_delay=60)
+        self.add(buffer, {"n": 1}, {"n": 2})
+        self.assertEqual(self.db.segments.count_documents({}), 0)
+
+        self.add(buffer, {"n": 3})
+        self.assertEqual(self.db.segments.count_documents({}), 3)
+        self.assertEqual(buffer.stats()["pending"], 0)
+
+    def test_flushes_after_the_batch_delay(self):
+        buffer = MongoWriteBuffer("segments", max_batch_size=100, max_batch_delay=0.05)
+        self.add(buffer, {"n": 1}, {"n": 2})
+        self.assertEqual(self.db.segments.count_documents({}), 0)
+
+        time.sleep(0.3)
+        self.assertEqual(self.db.segments.count_documents({}), 2)
+
+    def test_unordered_batch_continues_past_a_duplicate_key(self):
+        buffer = MongoWriteBuffer("segments", max_batch_size=3, max_batch_delay=60)
+        self.add(buffer, {"_id": 1}, {"_id": 1}, {"_id": 2})
+
+        self.assertEqual(
+            sorted(document["_id"] for document in self.db.segments.find()), [1, 2]
+        )
+        stats = buffer.stats()
+        self.assertEqual(stats["documents_written"], 2)
+        self.assertEqual(stats["write_errors"], 1)
+
+    def test_stats(self):
+        buffer = MongoWriteBuffer("segments", max_batch_size=2, max_batch_delay=60)
+        self.add(buffer, {"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}, {"n": 5})
+
+        stats = buffer.stats()
+        self.assertEqual(stats["pending"], 1)
+        self.assertEqual(stats["flushes"], 2)
+        self.assertEqual(stats["documents_written"], 4)
+        self.assertEqual(stats["write_errors"], 0)
+        self.assertGreaterEqual(stats["max_flush_seconds"], stats["avg_flush_seconds"])
+
+        run_async(buffer.close())
+        self.assertEqual(buffer.stats()["pending"], 0)
+        self.assertEqual(self.db.segments.count_documents({}), 5)
+
+    def test_failed_flush_is_counted(self):
+        buffer = MongoWriteBuffer("segments", max_batch_size=2, max_batch_delay=60)
+        with mock.patch.object(buffer, "insert_many", side_effect=OSError("down")):
+            self.add(buffer, {"n": 1}, {"n": 2})
+
+        stats = buffer.stats()
+        self.assertEqual(stats["flushes"], 1)
+        self.assertEqual(stats["write_errors"], 2)
+
+
+class BackgroundQueueTests(SimpleTestCase):
+    def setUp(self):
+        # A runtime of the test's own, so shutting it down drains only this queue
+        self.runtime = AsyncRuntime()
+        patcher = mock.patch("audojiengine.background.runtime", self.runtime)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.runtime.shutdown)
+
+    def test_submit_waits_while_the_queue_is_full(self):
+        queue = BackgroundQueue("test", workers=1, maxsize=1)
+        release = threading.Event()
+
+        async def blocked():
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+
+        # One job held by the worker, one filling the queue
+        self.runtime.run(queue.submit(blocked))
+        while queue.stats()["running"] == 0:
+            time.sleep(0.01)
+        self.runtime.run(queue.submit(blocked))
+
+        third = self.runtime.submit(queue.submit(blocked))
+        time.sleep(0.1)
+        self.assertFalse(third.done())
+
+        release.set()
+        third.result(timeout=1)
+        self.assertEqual(queue.stats()["submitted"], 3)
+
+    def test_shutdown_drains_pending_work(self):
+        queue = BackgroundQueue("test", workers=2, maxsize=10)
+        done = []
+
+        async def job(n):
+            await asyncio.sleep(0.05)
+            done.append(n)
+
+        for n in range(5):
+            self.runtime.run(queue.submit(job, n))
+        self.runtime.shutdown()
+
+        self.assertEqual(sorted(done), list(range(5)))
+        self.assertEqual(queue.stats()["completed"], 5)
+
+    def test_stats_are_logged_periodically(self):
+        queue = BackgroundQueue("test", workers=1, maxsize=10, stats_interval=0.05)
+
+        async def job():
+            pass
+
+        with self.assertLogs("audojiengine.background", "INFO") as logs:
+            self.runtime.run(queue.submit(job))
+            time.sleep(0.2)
+        self.assertIn("test queue: {'depth': 0", logs.output[0])
+
+
+class BackoffDelayTests(SimpleTestCase):
+    def error(self, retry_after):
+        return mock.Mock(response=mock.Mock(headers={"retry-after": retry_after}))
+
+    def test_retry_after_is_honoured(self):
+        delay = backoff_delay(0, self.error("2"))
+        self.assertGreaterEqual(delay, 2)
+        self.assertLessEqual(delay, 2 + BACKOFF_BASE)
+
+    def test_retry_after_is_capped(self):
+        for retry_after in ("3600", "inf"):
+            with self.subTest(retry_after=retry_after):
+                delay = backoff_delay(0, self.error(retry_after))
+                self.assertLessEqual(delay, BACKOFF_CAP + BACKOFF_BASE)
+
+    def test_invalid_retry_after_falls_back_to_exponential_backoff(self):
+        delay = backoff_delay(3, self.error("soon"))
+        self.assertLessEqual(delay, BACKOFF_BASE * 2**3)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AudojifactoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "audojifactory"
+
+    def ready(self):
+        from audojifactory import signals  # noqa
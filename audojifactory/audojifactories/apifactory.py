@@ -8,40 +8,32 @@ import shutil
 import librosa
 import openai
 from asgiref.sync import sync_to_async
-from channels.layers import get_channel_layer
-from django.conf import settings
 from django.core.files.base import ContentFile
-from openai import AsyncOpenAI
 from pydub import AudioSegment
 
 from audojiengine.logging_config import configure_logger
+from audojiengine.openai_client import openai_governor
 from audojifactory.audojifactories.opensourcefactory import AudioRetrieval
 from audojifactory.models import AudioSegment as AudioSegmentModel
+from audojifactory.notifications import SegmentNotificationBatcher
 from audojifactory.serializers import AudioSegmentSerializer
 
 import requests
 import tempfile
 
-openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 logger = configure_logger(__name__)
 
 
 class AudioProcessor:
     def __init__(self, audio_file_instance, group_name=None):
         self.group_name = group_name
+        self.segment_notifier = SegmentNotificationBatcher(group_name)
         self.audio_file_instance = audio_file_instance
         self.audio_path = audio_file_instance.audio_file.url
         self.temp_audio_path = self.download_audio(self.audio_path)
 
     async def send_segment_to_group(self, segment_data):
-        channel_layer = get_channel_layer()
-        await channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "audio.segment",
-                "message": segment_data,
-            },
-        )
+        await self.segment_notifier.add(segment_data)
 
     def download_audio(self, audio_url):
         """Download audio from URL to a temporary file and return the file path."""
@@ -67,8 +59,10 @@ class AudioProcessor:
             response = requests.get(self.audio_path, stream=True)
             
             # transcript = self.client.audio.transcriptions.create(model="whisper-1", file=audio_file, response_format="vtt")
-            transcript = await openai_client.audio.transcriptions.create(
-                file=open(self.temp_audio_path, 'rb'),
+            with open(self.temp_audio_path, "rb") as audio_file:
+                audio_content = audio_file.read()
+            transcript = await openai_governor.create_transcription(
+                file=(os.path.basename(self.temp_audio_path), audio_content),
                 model="whisper-1",
                 response_format="verbose_json",
                 timestamp_granularities=["word", "segment"],
@@ -103,7 +97,7 @@ class AudioProcessor:
             {{'category': 'Party Time'}}"""
 
         try:
-            response = await openai_client.chat.completions.create(
+            response = await openai_governor.create_chat_completion(
                 model="gpt-4-1106-preview",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=1000,
@@ -198,6 +192,7 @@ class AudioProcessor:
                 f"Segment {i} exported and saved: Text: {text} | Start - {start_ms}ms, End - {end_ms}ms"
             )
 
+        await self.segment_notifier.close()
         logger.info("Done Creating Audojis")
 
     async def run_and_save_segments(self):
@@ -2,6 +2,7 @@ import io
 import json
 import os
 import tempfile
+from urllib.parse import unquote, urlparse
 
 import boto3
 import librosa
@@ -10,18 +11,26 @@ import requests
 from asgiref.sync import sync_to_async
 from channels.layers import get_channel_layer
 from decouple import config
-from django.conf import settings
 from django.core.files.base import ContentFile
-from openai import AsyncOpenAI
 from pydub import AudioSegment as AudioSegmentCreator
 
+from audojiengine.http_client import get_http_client
 from audojiengine.logging_config import configure_logger
 from audojiengine.mg_database import store_data_to_audio_segment_mgdb
+from audojiengine.openai_client import openai_governor
+from audojifactory.models import AudioFile
 from audojifactory.models import AudioSegment as AudioSegmentModel
 from audojifactory.models import Category
+from audojifactory.notifications import SegmentNotificationBatcher
+from audojifactory.renditions import delete_renditions
 from audojifactory.serializers import AudioSegmentSerializer
+from audojifactory.waveform import (
+    SEGMENT_PEAK_BUCKETS,
+    clip_samples,
+    compute_peaks,
+    pcm_samples,
+)
 
-openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 logger = configure_logger(__name__)
 
 
@@ -37,11 +46,72 @@ categories_structure = json.dumps(
 )
 
 
+async def analyze_category_async(transcription):
+    logger.info("Analysing categories")
+
+    instruction = f"""
+    Below are the various categories and their explanation. Analyzing the portion of music lyric given, I want you categorize the \
+        given text using the following categories. One lyrics can belong to multiple categories:
+
+    Hello: Greetings and expressions used to initiate a conversation or acknowledge someone's presence.
+    Goodbye: Phrases used to end a conversation or to bid farewell.
+    Yes: Affirmative responses expressing agreement, confirmation, or willingness.
+    No: Negative responses expressing disagreement, refusal, or denial.
+    I'm good: Expressions indicating a positive state of being, happiness, or satisfaction.
+    Thank You: Phrases expressing gratitude or appreciation.
+    Sorry: Expressions of apology or regret.
+    Love You: Phrases expressing affection or strong positive feelings towards someone.
+    Miss You: Expressions conveying a longing for someone's presence or company.
+    I Don't Know: Phrases indicating uncertainty, lack of knowledge, or inability to answer a question.
+    Wanna Hang?: Invitations to spend time together or engage in a social activity.
+    Hook-Up: Expressions suggesting a casual sexual encounter or romantic interest.
+    Looking Good: Compliments on someone's physical appearance.
+    BRB: Acronym indicating a brief absence or pause in the conversation.
+    On My Way: Phrases signaling that the person is en route or ready to meet.
+    Party Time: Expressions associated with celebrations, weekends, or festive occasions.
+    OMG: Exclamations of surprise, shock, or strong emotional reactions.
+    Excited: Expressions of enthusiasm or anticipation.
+    Stressed Out: Phrases indicating feelings of anxiety, pressure, or being overwhelmed.
+    Mad: Expressions of anger, frustration, or annoyance.
+    Sad: Phrases conveying feelings of unhappiness, loneliness, or emotional distress.
+    Who Cares: Expressions of indifference or dismissal.
+    Where Are You?: Questions inquiring about someone's location or urging them to hurry.
+    Hungover: Phrases related to the aftereffects of excessive alcohol consumption.
+    Break-Up: Expressions associated with ending a romantic relationship.
+    Call Me: Requests for communication or a phone call.
+    Others: Expressions, phrases, or statements that do not fit into any of the above mentioned categories.
+    """
+
+    structured_instruction = f"{instruction}\n\nHere is how I would like the information to be structured in JSON format:\n{categories_structure}"
+    message = f"Music Lyric Text: '{transcription}'"
+
+    messages = [
+        {"role": "system", "content": structured_instruction},
+        {"role": "user", "content": message},
+    ]
+
+    try:
+        response = await openai_governor.create_chat_completion(
+            model="gpt-4-turbo",
+            messages=messages,
+            max_tokens=1000,
+            response_format={"type": "json_object"},
+        )
+        processed_response = json.loads(response.choices[0].message.content)
+        logger.info(f"This is the response: {processed_response}")
+        categories = processed_response.get("categories", None)
+        return categories
+    except openai.APIError as e:
+        logger.error(f"OpenAI API error: {e}")
+        return None
+
+
 class AudioProcessor:
     def __init__(self, audio_file_instance, group_name=None):
         import whisper
 
         self.group_name = group_name
+        self.segment_notifier = SegmentNotificationBatcher(group_name)
         self.audio_file_instance = audio_file_instance
         # self.audio_path = audio_file_instance.audio_file.path
         self.audio_path = audio_file_instance.audio_file.url
@@ -50,76 +120,13 @@ class AudioProcessor:
         )  # "base", "medium", "large-v1", "large-v2", "large-v3", "large"
 
     async def send_segment_to_group(self, segment_data):
-        channel_layer = get_channel_layer()
-        await channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "audio.segment",
-                "message": segment_data,
-            },
-        )
+        await self.segment_notifier.add(segment_data)
 
     async def transcribe_audio(self):
         return self.model.transcribe(self.audio_path)
 
     async def analyze_category_async(self, transcription):
-        logger.info("Analysing categories")
-
-        instruction = f"""
-        Below are the various categories and their explanation. Analyzing the portion of music lyric given, I want you categorize the \
-            given text using the following categories. One lyrics can belong to multiple categories:
-
-        Hello: Greetings and expressions used to initiate a conversation or acknowledge someone's presence.
-        Goodbye: Phrases used to end a conversation or to bid farewell.
-        Yes: Affirmative responses expressing agreement, confirmation, or willingness.
-        No: Negative responses expressing disagreement, refusal, or denial.
-        I'm good: Expressions indicating a positive state of being, happiness, or satisfaction.
-        Thank You: Phrases expressing gratitude or appreciation.
-        Sorry: Expressions of apology or regret.
-        Love You: Phrases expressing affection or strong positive feelings towards someone.
-        Miss You: Expressions conveying a longing for someone's presence or company.
-        I Don't Know: Phrases indicating uncertainty, lack of knowledge, or inability to answer a question.
-        Wanna Hang?: Invitations to spend time together or engage in a social activity.
-        Hook-Up: Expressions suggesting a casual sexual encounter or romantic interest.
-        Looking Good: Compliments on someone's physical appearance.
-        BRB: Acronym indicating a brief absence or pause in the conversation.
-        On My Way: Phrases signaling that the person is en route or ready to meet.
-        Party Time: Expressions associated with celebrations, weekends, or festive occasions.
-        OMG: Exclamations of surprise, shock, or strong emotional reactions.
-        Excited: Expressions of enthusiasm or anticipation.
-        Stressed Out: Phrases indicating feelings of anxiety, pressure, or being overwhelmed.
-        Mad: Expressions of anger, frustration, or annoyance.
-        Sad: Phrases conveying feelings of unhappiness, loneliness, or emotional distress.
-        Who Cares: Expressions of indifference or dismissal.
-        Where Are You?: Questions inquiring about someone's location or urging them to hurry.
-        Hungover: Phrases related to the aftereffects of excessive alcohol consumption.
-        Break-Up: Expressions associated with ending a romantic relationship.
-        Call Me: Requests for communication or a phone call.
-        Others: Expressions, phrases, or statements that do not fit into any of the above mentioned categories.
-        """
-
-        structured_instruction = f"{instruction}\n\nHere is how I would like the information to be structured in JSON format:\n{categories_structure}"
-        message = f"Music Lyric Text: '{transcription}'"
-
-        messages = [
-            {"role": "system", "content": structured_instruction},
-            {"role": "user", "content": message},
-        ]
-
-        try:
-            response = await openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                max_tokens=1000,
-                response_format={"type": "json_object"},
-            )
-            processed_response = json.loads(response.choices[0].message.content)
-            logger.info(f"This is the response: {processed_response}")
-            categories = processed_response.get("categories", None)
-            return categories
-        except openai.APIError as e:
-            logger.error(f"OpenAI API error: {e}")
-            return None
+        return await analyze_category_async(transcription)
 
     async def process_and_save_segments(self, result):
         logger.info("Processing Started")
@@ -176,6 +183,7 @@ class AudioProcessor:
                 f"Segment {i} exported and saved: Text: {segment.get('text', '')} | Start - {segment['start']}s, End - {segment['end']}s"
             )
 
+        await self.segment_notifier.close()
         logger.info("Done Creating Audojis")
 
     async def run_and_save_segments(self):
@@ -187,79 +195,26 @@ class AudioProcessor:
 class AudioProcessorAWS:
     def __init__(self, audio_file_url, transcription_result, group_name=None):
         self.group_name = group_name
+        self.segment_notifier = SegmentNotificationBatcher(group_name)
         self.audio_path = audio_file_url
         self.transcription_result = transcription_result
+        self.audio_file_instance = None
 
-    async def send_segment_to_group(self, segment_data):
-        channel_layer = get_channel_layer()
-        await channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "audio.segment",
-                "message": segment_data,
-            },
-        )
-
-    async def analyze_category_async(self, transcription):
-        logger.info("Analysing categories")
-
-        # categories = "Affection, Gratitude, Apologies, Excitement, Disinterest, Well-being, Greetings"
-
-        instruction = f"""
-        Below are the various categories and their explanation. Analyzing the portion of music lyric given, I want you categorize the \
-            given text using the following categories. One lyrics can belong to multiple categories:
-
-        Hello: Greetings and expressions used to initiate a conversation or acknowledge someone's presence.
-        Goodbye: Phrases used to end a conversation or to bid farewell.
-        Yes: Affirmative responses expressing agreement, confirmation, or willingness.
-        No: Negative responses expressing disagreement, refusal, or denial.
-        I'm good: Expressions indicating a positive state of being, happiness, or satisfaction.
-        Thank You: Phrases expressing gratitude or appreciation.
-        Sorry: Expressions of apology or regret.
-        Love You: Phrases expressing affection or strong positive feelings towards someone.
-        Miss You: Expressions conveying a longing for someone's presence or company.
-        I Don't Know: Phrases indicating uncertainty, lack of knowledge, or inability to answer a question.
-        Wanna Hang?: Invitations to spend time together or engage in a social activity.
-        Hook-Up: Expressions suggesting a casual sexual encounter or romantic interest.
-        Looking Good: Compliments on someone's physical appearance.
-        BRB: Acronym indicating a brief absence or pause in the conversation.
-        On My Way: Phrases signaling that the person is en route or ready to meet.
-        Party Time: Expressions associated with celebrations, weekends, or festive occasions.
-        OMG: Exclamations of surprise, shock, or strong emotional reactions.
-        Excited: Expressions of enthusiasm or anticipation.
-        Stressed Out: Phrases indicating feelings of anxiety, pressure, or being overwhelmed.
-        Mad: Expressions of anger, frustration, or annoyance.
-        Sad: Phrases conveying feelings of unhappiness, loneliness, or emotional distress.
-        Who Cares: Expressions of indifference or dismissal.
-        Where Are You?: Questions inquiring about someone's location or urging them to hurry.
-        Hungover: Phrases related to the aftereffects of excessive alcohol consumption.
-        Break-Up: Expressions associated with ending a romantic relationship.
-        Call Me: Requests for communication or a phone call.
-        Others: Expressions, phrases, or statements that do not fit into any of the above mentioned categories.
+    async def load_audio_file_instance(self):
         """
+        The AudioFile the callback is for, found by the storage name in its URL.
+        The URL may carry the storage location or a signature, so every path
+        suffix is tried as a name.
+        """
+        parts = unquote(urlparse(self.audio_path).path).strip("/").split("/")
+        names = ["/".join(parts[i:]) for i in range(len(parts))]
+        return await AudioFile.objects.filter(audio_file__in=names).alatest("id")
 
-        structured_instruction = f"{instruction}\n\nHere is how I would like the information to be structured in JSON format:\n{categories_structure}"
-        message = f"Music Lyric Text: '{transcription}'"
-
-        messages = [
-            {"role": "system", "content": structured_instruction},
-            {"role": "user", "content": message},
-        ]
+    async def send_segment_to_group(self, segment_data):
+        await self.segment_notifier.add(segment_data)
 
-        try:
-            response = await openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                max_tokens=1000,
-                response_format={"type": "json_object"},
-            )
-            processed_response = json.loads(response.choices[0].message.content)
-            logger.info(f"This is the response: {processed_response}")
-            categories = processed_response.get("categories", None)
-            return categories
-        except openai.APIError as e:
-            logger.error(f"OpenAI API error: {e}")
-            return None
+    async def analyze_category_async(self, transcription):
+        return await analyze_category_async(transcription)
 
     async def process_and_save_segments(self, result):
         logger.info("Processing Started")
@@ -303,10 +258,12 @@ class AudioProcessorAWS:
                 f"Segment {i} exported and saved: Text: {segment.get('text', '')} | Start - {segment['start']}s, End - {segment['end']}s"
             )
 
+        await self.segment_notifier.close()
         logger.info("Done Creating Audojis")
 
     async def run_and_save_segments(self):
         logger.info("Run operation started!")
+        self.audio_file_instance = await self.load_audio_file_instance()
         return await self.process_and_save_segments(self.transcription_result)
 
 
@@ -334,7 +291,18 @@ class AudioRetrieval:
     def create_audoji(self):
         # Download the audio file from URL to a bytes buffer
         audio_response = requests.get(self.associated_audio_file)
-        audio_bytes = io.BytesIO(audio_response.content)
+        return self.save_audoji(audio_response.content)
+
+    async def acreate_audoji(self):
+        """Async variant of create_audoji for views running on the event loop."""
+        audio_response = await get_http_client().get(self.associated_audio_file)
+        audio_response.raise_for_status()
+
+        # Decoding, cutting and the storage upload stay sync
+        return await sync_to_async(self.save_audoji)(audio_response.content)
+
+    def save_audoji(self, audio_content):
+        audio_bytes = io.BytesIO(audio_content)
 
         # Use Pydub to process the audio from the bytes buffer
         audio = AudioSegmentCreator.from_file(audio_bytes)
@@ -365,11 +333,21 @@ class AudioRetrieval:
 
         self.audio_file_instance.start_time = self.start_time
         self.audio_file_instance.end_time = self.end_time
+        # Peaks of the new cut, as the pipeline's cut_segments makes them
+        samples, full_scale = pcm_samples(audio)
+        self.audio_file_instance.waveform_peaks = compute_peaks(
+            clip_samples(samples, audio, self.start_time, self.end_time),
+            audio.channels,
+            full_scale,
+            SEGMENT_PEAK_BUCKETS,
+        )
 
         self.audio_file_instance.segment_file.save(
             segment_file_name, ContentFile(segment_file.read())  # , save=False
         )
         self.audio_file_instance.save()
+        # Renditions of the previous cut would otherwise be served on
+        delete_renditions(self.audio_file_instance)
 
         segment_info = {
             "id": self.audio_file_instance.id,
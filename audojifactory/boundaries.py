@@ -0,0 +1,234 @@
+import librosa
+import numpy as np
+
+ENVELOPE_SAMPLE_RATE = 22050
+ENVELOPE_FRAME_LENGTH = 2048
+ENVELOPE_HOP_LENGTH = 512  # ~23 ms per frame
+
+# How far a boundary may move to reach a valley. Starts mostly move earlier and
+# ends mostly later, since clipped words are the failure being fixed.
+SNAP_WINDOW = 0.3  # seconds
+SNAP_INWARD_WINDOW = SNAP_WINDOW / 4
+# Cost of moving a full window away, relative to the song's median energy, so a
+# boundary only moves far for a clearly deeper valley
+SNAP_DISTANCE_WEIGHT = 0.5
+MIN_SEGMENT_DURATION = 0.2  # seconds
+
+# Word confidence rules (from the v2.py prototype): a segment whose last word
+# is uncertain probably ends later than Whisper says, and the segment after it
+# probably starts later
+LOW_CONFIDENCE = 0.35
+MEDIUM_CONFIDENCE = 0.7
+LOW_CONFIDENCE_LAST_TAIL = 1.0  # seconds added to the song's last segment
+MEDIUM_CONFIDENCE_TAIL = 0.5  # seconds
+LOW_CONFIDENCE_NEXT_DELAY = 0.5  # seconds
+MEDIUM_CONFIDENCE_NEXT_DELAY = 0.2  # seconds
+
+
+def compute_energy_envelope(path):
+    """Return the song's frame-level RMS envelope and the seconds per frame."""
+    samples, sample_rate = librosa.load(path, sr=ENVELOPE_SAMPLE_RATE, mono=True)
+    rms = librosa.feature.rms(
+        y=samples,
+        frame_length=ENVELOPE_FRAME_LENGTH,
+        hop_length=ENVELOPE_HOP_LENGTH,
+    )[0]
+    return rms, ENVELOPE_HOP_LENGTH / sample_rate
+
+
+def snap_to_valleys(times, rms, frame_duration, lower, upper):
+    """
+    Move each time to the lowest-energy frame within its [lower, upper] limits.
+
+    All boundaries are handled at once: a (boundaries x window) matrix of
+    candidate frames is scored by energy plus a small distance penalty, and the
+    best candidate per row wins.
+    """
+    times = np.asarray(times, dtype=float)
+    if times.size == 0 or rms.size == 0:
+        return times
+
+    reach = max(np.max(times - lower), np.max(upper - times), 0.0)
+    radius = int(np.ceil(reach / frame_duration))
+    offsets = np.arange(-radius, radius + 1)
+    centers = np.rint(times / frame_duration).astype(int)
+    candidates = centers[:, None] + offsets[None, :]
+    candidate_times = candidates * frame_duration
+
+    allowed = (
+        (candidates >= 0)
+        & (candidates < rms.size)
+        & (candidate_times >= np.asarray(lower, dtype=float)[:, None])
+        & (candidate_times <= np.asarray(upper, dtype=float)[:, None])
+    )
+    energy = rms[np.clip(candidates, 0, rms.size - 1)]
+    distance_cost = (
+        SNAP_DISTANCE_WEIGHT
+        * float(np.median(rms))
+        * np.abs(offsets)[None, :]
+        / max(radius, 1)
+    )
+    scores = np.where(allowed, energy + distance_cost, np.inf)
+
+    best = scores.argmin(axis=1)
+    snapped = candidate_times[np.arange(times.size), best]
+    # Rows with no allowed candidate keep their time
+    return np.where(np.isfinite(scores.min(axis=1)), snapped, times)
+
+
+def refine_with_words(
+    starts, ends, word_starts, word_ends, word_probabilities=None, duration=None
+):
+    """
+    Adjust segment boundaries using word timestamps, for all segments at once.
+
+    Each segment is first widened to cover every word it overlaps, so no word is
+    cut in half. Then the v2.py confidence rules apply to the segment's last
+    word: below LOW_CONFIDENCE the end moves halfway into the gap before the
+    next segment (LOW_CONFIDENCE_LAST_TAIL for the song's last segment) and the
+    next segment starts LOW_CONFIDENCE_NEXT_DELAY later; below MEDIUM_CONFIDENCE
+    the end gets MEDIUM_CONFIDENCE_TAIL and the next start
+    MEDIUM_CONFIDENCE_NEXT_DELAY. Words without a probability (the whisper-1
+    API) count as confident. Ends never run into the next segment's first word
+    and starts never move past their own first word.
+
+    Returns (starts, ends, first_word_starts, last_word_ends) as arrays; the
+    last two are the limits silence snapping must not cross.
+    """
+    starts = np.array(starts, dtype=float)
+    ends = np.array(ends, dtype=float)
+    word_starts = np.asarray(word_starts, dtype=float)
+    word_ends = np.asarray(word_ends, dtype=float)
+    if word_probabilities is None:
+        word_probabilities = np.ones_like(word_starts)
+    word_probabilities = np.nan_to_num(
+        np.asarray(word_probabilities, dtype=float), nan=1.0
+    )
+    if starts.size == 0:
+        return starts, ends, starts.copy(), ends.copy()
+
+    if word_starts.size:
+        order = np.argsort(word_starts, kind="stable")
+        word_starts = word_starts[order]
+        word_ends = word_ends[order]
+        word_probabilities = word_probabilities[order]
+
+        # First word ending after the segment starts, last word starting before
+        # it ends: together, the words the segment overlaps
+        first = np.searchsorted(word_ends, starts, side="right")
+        last = np.searchsorted(word_starts, ends, side="left") - 1
+        has_words = first <= last
+        first = np.clip(first, 0, word_starts.size - 1)
+        last = np.clip(last, 0, word_starts.size - 1)
+
+        first_word_starts = np.where(has_words, word_starts[first], starts)
+        last_word_ends = np.where(has_words, word_ends[last], ends)
+        confidence = np.where(has_words, word_probabilities[last], 1.0)
+        starts = np.minimum(starts, first_word_starts)
+        ends = np.maximum(ends, last_word_ends)
+    else:
+        first_word_starts = starts.copy()
+        last_word_ends = ends.copy()
+        confidence = np.ones_like(starts)
+
+    low = confidence < LOW_CONFIDENCE
+    medium = ~low & (confidence < MEDIUM_CONFIDENCE)
+    is_last = np.arange(starts.size) == starts.size - 1
+
+    gaps = np.append(starts[1:], np.inf) - ends
+    tails = np.where(
+        low,
+        np.where(is_last, LOW_CONFIDENCE_LAST_TAIL, gaps / 2),
+        np.where(medium, MEDIUM_CONFIDENCE_TAIL, 0.0),
+    )
+    ends = ends + np.maximum(tails, 0.0)
+
+    delays = np.where(
+        low,
+        LOW_CONFIDENCE_NEXT_DELAY,
+        np.where(medium, MEDIUM_CONFIDENCE_NEXT_DELAY, 0.0),
+    )[:-1]
+    starts[1:] = np.minimum(starts[1:] + delays, first_word_starts[1:])
+
+    ends[:-1] = np.minimum(
+        ends[:-1], np.maximum(first_word_starts[1:], last_word_ends[:-1])
+    )
+    if duration is not None:
+        ends = np.minimum(ends, np.maximum(duration, last_word_ends))
+    starts = np.maximum(starts, 0.0)
+    return starts, ends, first_word_starts, last_word_ends
+
+
+def snap_boundaries(
+    starts, ends, rms, frame_duration, duration, latest_starts=None, earliest_ends=None
+):
+    """
+    Snap segment starts and ends to nearby energy valleys. Starts never move
+    past ``latest_starts`` and ends never before ``earliest_ends`` (the first
+    and last word of each segment, when known).
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+
+    start_upper = starts + SNAP_INWARD_WINDOW
+    end_lower = ends - SNAP_INWARD_WINDOW
+    if latest_starts is not None:
+        start_upper = np.minimum(start_upper, np.maximum(latest_starts, starts))
+    if earliest_ends is not None:
+        end_lower = np.maximum(end_lower, np.minimum(earliest_ends, ends))
+
+    new_starts = snap_to_valleys(
+        starts,
+        rms,
+        frame_duration,
+        lower=np.maximum(starts - SNAP_WINDOW, 0.0),
+        upper=start_upper,
+    )
+    new_ends = snap_to_valleys(
+        ends,
+        rms,
+        frame_duration,
+        lower=end_lower,
+        upper=np.maximum(np.minimum(ends + SNAP_WINDOW, duration), ends),
+    )
+
+    # Never let snapping collapse a segment
+    collapsed = new_ends - new_starts < MIN_SEGMENT_DURATION
+    return np.where(collapsed, starts, new_starts), np.where(collapsed, ends, new_ends)
+
+
+def refine_transcript_boundaries(path, transcript):
+    """
+    Return the transcript with every segment's edges fitted to its words, then
+    snapped to silence without cutting into them.
+    """
+    segments, words = transcript["segments"], transcript["words"]
+    if not segments:
+        return transcript
+
+    rms, frame_duration = compute_energy_envelope(path)
+    duration = rms.size * frame_duration
+    starts, ends, first_word_starts, last_word_ends = refine_with_words(
+        [segment["start"] for segment in segments],
+        [segment["end"] for segment in segments],
+        [word["start"] for word in words],
+        [word["end"] for word in words],
+        [word.get("probability", np.nan) for word in words],
+        duration=duration,
+    )
+    starts, ends = snap_boundaries(
+        starts,
+        ends,
+        rms,
+        frame_duration,
+        duration,
+        latest_starts=first_word_starts,
+        earliest_ends=last_word_ends,
+    )
+    return {
+        **transcript,
+        "segments": [
+            {**segment, "start": float(start), "end": float(end)}
+            for segment, start, end in zip(segments, starts, ends)
+        ],
+    }
@@ -0,0 +1,95 @@
+from audojifactory.models import (
+    AudioFile,
+    AudioSegment,
+    SyncChange,
+    UserSelectedAudoji,
+)
+
+MODEL_KINDS = {
+    AudioFile: SyncChange.AUDIO_FILE,
+    AudioSegment: SyncChange.AUDIO_SEGMENT,
+    UserSelectedAudoji: SyncChange.SELECTION,
+}
+
+
+def get_change_owner_and_id(instance, owner=None):
+    if isinstance(instance, AudioFile):
+        return instance.owner, instance.pk
+    if isinstance(instance, AudioSegment):
+        if owner is None:
+            owner = instance.audio_file.owner
+        return owner, instance.pk
+    return instance.user_id, instance.audio_segment_id
+
+
+def record_change(instance, deleted=False, owner=None):
+    """
+    Append a change for the instance and stamp its change_seq. A known
+    ``owner`` saves loading a segment's audio file to find it.
+    """
+    owner, object_id = get_change_owner_and_id(instance, owner)
+    change = SyncChange.objects.create(
+        kind=MODEL_KINDS[type(instance)],
+        object_id=object_id,
+        owner=owner,
+        deleted=deleted,
+    )
+    if not deleted:
+        # update() so the post_save receiver is not triggered again
+        type(instance).objects.filter(pk=instance.pk).update(change_seq=change.id)
+        instance.change_seq = change.id
+    return change.id
+
+
+def record_selection_changes(user_id, segment_ids):
+    """Record selections written with bulk_create, which skips model signals."""
+    if not segment_ids:
+        return None
+    changes = SyncChange.objects.bulk_create(
+        [
+            SyncChange(kind=SyncChange.SELECTION, object_id=segment_id, owner=user_id)
+            for segment_id in segment_ids
+        ]
+    )
+    change_seq = max(change.id for change in changes)
+    UserSelectedAudoji.objects.filter(
+        user_id=user_id, audio_segment_id__in=segment_ids
+    ).update(change_seq=change_seq)
+    return change_seq
+
+
+def record_segment_changes(segments):
+    """Record segments written with bulk_update, which skips model signals."""
+    if not segments:
+        return None
+    changes = SyncChange.objects.bulk_create(
+        [
+            SyncChange(
+                kind=SyncChange.AUDIO_SEGMENT,
+                object_id=segment.pk,
+                owner=segment.audio_file.owner,
+            )
+            for segment in segments
+        ]
+    )
+    change_seq = max(change.id for change in changes)
+    AudioSegment.objects.filter(pk__in=[segment.pk for segment in segments]).update(
+        change_seq=change_seq
+    )
+    return change_seq
+
+
+def collapse_changes(changes):
+    """
+    Reduce an ordered list of changes to the latest state per object.
+
+    Returns {kind: (changed_ids, deleted_ids)}.
+    """
+    latest = {}
+    for change in changes:
+        latest[(change.kind, change.object_id)] = change.deleted
+
+    collapsed = {kind: ([], []) for kind in MODEL_KINDS.values()}
+    for (kind, object_id), deleted in latest.items():
+        collapsed[kind][1 if deleted else 0].append(object_id)
+    return collapsed
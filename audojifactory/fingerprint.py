@@ -0,0 +1,122 @@
+import librosa
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from audojifactory.models import AudioFingerprint, AudioFingerprintBand, AudioSegment
+
+FINGERPRINT_SAMPLE_RATE = 11025
+FINGERPRINT_HOP_LENGTH = 2048
+# The track is averaged into this many time blocks; each of the 12 chroma bins
+# contributes one bit per pair of neighbouring blocks (12 * 32 = 384 bits)
+FINGERPRINT_BLOCKS = 33
+# One band per chroma bin: 32 bits, 8 hex characters
+BAND_LENGTH = (FINGERPRINT_BLOCKS - 1) // 4
+
+# Near-identical tracks (re-encodes, different bitrates, trimmed silence)
+MAX_HAMMING_DISTANCE = 40
+MAX_DURATION_DIFFERENCE = 2.0  # seconds
+
+
+def compute_fingerprint(path):
+    """
+    Return (hash, duration) for the audio at ``path``, or None if it is too short.
+
+    Each bit records whether a chroma bin rises or falls between two neighbouring
+    blocks of the track, which survives gain changes and lossy re-encoding.
+    """
+    samples, sample_rate = librosa.load(path, sr=FINGERPRINT_SAMPLE_RATE, mono=True)
+    samples, _ = librosa.effects.trim(samples, top_db=40)
+    chroma = librosa.feature.chroma_stft(
+        y=samples, sr=sample_rate, hop_length=FINGERPRINT_HOP_LENGTH
+    )
+    if chroma.shape[1] < FINGERPRINT_BLOCKS:
+        return None
+
+    blocks = np.stack(
+        [block.mean(axis=1) for block in np.array_split(chroma, FINGERPRINT_BLOCKS, 1)],
+        axis=1,
+    )
+    bits = blocks[:, 1:] > blocks[:, :-1]
+    return np.packbits(bits).tobytes().hex(), len(samples) / sample_rate
+
+
+def split_bands(fingerprint_hash):
+    return [
+        fingerprint_hash[start : start + BAND_LENGTH]
+        for start in range(0, len(fingerprint_hash), BAND_LENGTH)
+    ]
+
+
+def hamming_distance(first_hash, second_hash):
+    # bin().count rather than int.bit_count, which needs Python 3.10
+    return bin(int(first_hash, 16) ^ int(second_hash, 16)).count("1")
+
+
+async def find_duplicate(fingerprint_hash, duration):
+    """Return the processed AudioFile closest to the fingerprint, if near enough."""
+    band_match = Q()
+    for band, value in enumerate(split_bands(fingerprint_hash)):
+        band_match |= Q(bands__band=band, bands__value=value)
+
+    candidates = (
+        AudioFingerprint.objects.filter(band_match)
+        .filter(
+            duration__gte=duration - MAX_DURATION_DIFFERENCE,
+            duration__lte=duration + MAX_DURATION_DIFFERENCE,
+        )
+        .select_related("audio_file")
+        .distinct()
+    )
+
+    best_match, best_distance = None, MAX_HAMMING_DISTANCE + 1
+    async for candidate in candidates:
+        distance = hamming_distance(fingerprint_hash, candidate.hash)
+        if distance < best_distance:
+            best_match, best_distance = candidate.audio_file, distance
+    return best_match
+
+
+def save_fingerprint(audio_file_id, fingerprint_hash, duration):
+    """Index a processed track so later uploads of it can be matched."""
+    with transaction.atomic():
+        fingerprint, _ = AudioFingerprint.objects.update_or_create(
+            audio_file_id=audio_file_id,
+            defaults={"hash": fingerprint_hash, "duration": duration},
+        )
+        fingerprint.bands.all().delete()
+        AudioFingerprintBand.objects.bulk_create(
+            AudioFingerprintBand(fingerprint=fingerprint, band=band, value=value)
+            for band, value in enumerate(split_bands(fingerprint_hash))
+        )
+
+
+async def link_duplicate(audio_file, source):
+    """
+    Give ``audio_file`` copies of the source track's segments. The copies point at
+    the source's segment files instead of re-encoding and re-uploading them.
+    """
+    segment_ids = []
+    async for segment in AudioSegment.objects.filter(audio_file=source).order_by(
+        "start_time"
+    ):
+        linked_segment = AudioSegment(
+            audio_file=audio_file,
+            start_time=segment.start_time,
+            end_time=segment.end_time,
+            segment_file=segment.segment_file.name,
+            transcription=segment.transcription,
+            category_id=segment.category_id,
+            waveform_peaks=segment.waveform_peaks,
+        )
+        # Saved one by one so the change log picks each segment up
+        await linked_segment.asave()
+        segment_ids.append(linked_segment.id)
+
+    audio_file.duplicate_of = source
+    audio_file.duration = source.duration
+    audio_file.waveform_peaks = source.waveform_peaks
+    await audio_file.asave(
+        update_fields=["duplicate_of", "duration", "waveform_peaks"]
+    )
+    return segment_ids
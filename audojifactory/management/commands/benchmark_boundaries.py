@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from audojifactory.boundaries import (
+    ENVELOPE_HOP_LENGTH,
+    ENVELOPE_SAMPLE_RATE,
+    refine_with_words,
+    snap_boundaries,
+)
+
+
+def synthetic_song(minutes, seed=0):
+    """A long song's envelope, segments and words, shaped like Whisper output."""
+    rng = np.random.default_rng(seed)
+    frame_duration = ENVELOPE_HOP_LENGTH / ENVELOPE_SAMPLE_RATE
+    duration = minutes * 60.0
+    rms = rng.uniform(0.2, 1.0, int(duration / frame_duration))
+
+    # Segments of 2-6 seconds with short gaps, three words each
+    lengths = rng.uniform(2.0, 6.0, int(duration / 4))
+    starts = np.cumsum(lengths + rng.uniform(0.1, 0.8, lengths.size)) - lengths
+    keep = starts + lengths < duration
+    starts, ends = starts[keep], (starts + lengths)[keep]
+
+    word_edges = starts[:, None] + (ends - starts)[:, None] * np.linspace(0, 1, 4)
+    word_starts = word_edges[:, :-1].ravel()
+    word_ends = word_edges[:, 1:].ravel() + rng.uniform(0, 0.3, word_starts.size)
+    probabilities = rng.uniform(0.1, 1.0, word_starts.size)
+
+    # A quiet valley just outside every segment edge
+    for edges in (starts - 0.1, ends + 0.1):
+        frames = np.clip((edges / frame_duration).astype(int), 0, rms.size - 1)
+        rms[frames] = 0.01
+    return (
+        rms,
+        frame_duration,
+        duration,
+        starts,
+        ends,
+        word_starts,
+        word_ends,
+        probabilities,
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmarks segment boundary refinement on a long synthetic song"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=float, default=60.0)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        (
+            rms,
+            frame_duration,
+            duration,
+            starts,
+            ends,
+            word_starts,
+            word_ends,
+            probabilities,
+        ) = synthetic_song(options["minutes"])
+
+        def refine_all():
+            refined = refine_with_words(
+                starts, ends, word_starts, word_ends, probabilities, duration
+            )
+            return snap_boundaries(
+                refined[0],
+                refined[1],
+                rms,
+                frame_duration,
+                duration,
+                latest_starts=refined[2],
+                earliest_ends=refined[3],
+            )
+
+        def refine_one_by_one():
+            # Same engine called per segment, as a loop-based stage would
+            for i in range(starts.size):
+                refined = refine_with_words(
+                    starts[i : i + 1],
+                    ends[i : i + 1],
+                    word_starts,
+                    word_ends,
+                    probabilities,
+                    duration,
+                )
+                snap_boundaries(
+                    refined[0],
+                    refined[1],
+                    rms,
+                    frame_duration,
+                    duration,
+                    latest_starts=refined[2],
+                    earliest_ends=refined[3],
+                )
+
+        self.stdout.write(
+            f"{options['minutes']:g} min song: {starts.size} segments, "
+            f"{word_starts.size} words, {rms.size} envelope frames"
+        )
+        runs = (("vectorized", refine_all), ("per segment", refine_one_by_one))
+        for name, run in runs:
+            timings = []
+            for _ in range(options["repeat"]):
+                start_time = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start_time)
+            best = min(timings)
+            self.stdout.write(
+                f"{name}: best {best * 1000:.1f} ms, "
+                f"median {np.median(timings) * 1000:.1f} ms, "
+                f"{starts.size / best:,.0f} segments/s"
+            )
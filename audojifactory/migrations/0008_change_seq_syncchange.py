@@ -0,0 +1,62 @@
+# Generated by Django 4.2.8 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0007_audiosegment_category"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audiofile",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="audiosegment",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userselectedaudoji",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="SyncChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("audio_file", "Audio file"),
+                            ("audio_segment", "Audio segment"),
+                            ("selection", "Selection"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("owner", models.CharField(max_length=255)),
+                ("deleted", models.BooleanField(default=False)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "id"], name="syncchange_owner_id_idx"
+                    )
+                ],
+            },
+        ),
+    ]
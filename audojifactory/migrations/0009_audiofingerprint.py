@@ -0,0 +1,79 @@
+# Generated by Django 4.2.8 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0008_change_seq_syncchange"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audiofile",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="audojifactory.audiofile",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AudioFingerprint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(max_length=96)),
+                ("duration", models.FloatField()),
+                (
+                    "audio_file",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fingerprint",
+                        to="audojifactory.audiofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AudioFingerprintBand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("band", models.PositiveSmallIntegerField()),
+                ("value", models.CharField(max_length=8)),
+                (
+                    "fingerprint",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bands",
+                        to="audojifactory.audiofingerprint",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["band", "value"], name="fingerprint_band_idx"
+                    )
+                ],
+            },
+        ),
+    ]
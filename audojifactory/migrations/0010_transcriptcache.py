@@ -0,0 +1,30 @@
+# Generated by Django 4.2.8 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0009_audiofingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranscriptCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("content_hash", models.CharField(db_index=True, max_length=64)),
+                ("transcript", models.BinaryField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.8 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0010_transcriptcache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audiofile",
+            name="waveform_peaks",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="audiosegment",
+            name="waveform_peaks",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.8 on 2026-10-19 16:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import audojifactory.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0011_waveform_peaks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SegmentRendition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("profile", models.CharField(max_length=20)),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to=audojifactory.models.get_rendition_upload_path
+                    ),
+                ),
+                ("size", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_accessed",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "segment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="renditions",
+                        to="audojifactory.audiosegment",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("segment", "profile")},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-19 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audojifactory", "0012_segmentrendition"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncchange",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
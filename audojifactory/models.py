@@ -1,3 +1,5 @@
+import os
+
 from django.db import models
 from django.utils import timezone
 
@@ -19,6 +21,17 @@ class AudioFile(models.Model):
     upload_date = models.DateTimeField(default=timezone.now)
     duration = models.FloatField(null=True, blank=True)
     spotify_link = models.URLField(max_length=200, null=True, blank=True)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+    # Set when the upload reused the segments of an already processed track
+    duplicate_of = models.ForeignKey(
+        "self",
+        related_name="duplicates",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    # int8 (min, max) pairs for the player's waveform (see audojifactory.waveform)
+    waveform_peaks = models.BinaryField(null=True, blank=True)
 
 
 def get_segment_upload_path(instance, filename):
@@ -43,6 +56,8 @@ class AudioSegment(models.Model):
         Category, on_delete=models.SET_NULL, null=True, blank=True
     )
     duration = models.FloatField(default=0.0, blank=True, null=True)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+    waveform_peaks = models.BinaryField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         self.duration = self.end_time - self.start_time
@@ -53,6 +68,111 @@ class UserSelectedAudoji(models.Model):
     user_id = models.CharField(max_length=255)  # Adjust max_length as needed
     audio_segment = models.ForeignKey(AudioSegment, on_delete=models.CASCADE)
     selected_at = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         unique_together = ("user_id", "audio_segment")
+
+
+class SyncChange(models.Model):
+    """
+    Append-only log of changes, used as the delta-sync feed.
+
+    The auto-incrementing id is the change sequence number copied onto the changed
+    row's change_seq. Deletes are recorded as tombstones (deleted=True). Selections
+    are keyed by their audio segment id, since (user_id, audio_segment) is unique.
+
+    Ids are assigned at insert, not commit, so a change can become visible after
+    a higher id already has; the feed only serves changes older than
+    settings.SYNC_CHANGE_SETTLE_SECONDS (see created_at).
+    """
+
+    AUDIO_FILE = "audio_file"
+    AUDIO_SEGMENT = "audio_segment"
+    SELECTION = "selection"
+    KIND_CHOICES = [
+        (AUDIO_FILE, "Audio file"),
+        (AUDIO_SEGMENT, "Audio segment"),
+        (SELECTION, "Selection"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    owner = models.CharField(max_length=255)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "id"], name="syncchange_owner_id_idx")
+        ]
+
+
+class AudioFingerprint(models.Model):
+    """
+    Chroma fingerprint of a fully processed track, used to detect re-uploads.
+
+    The hash is split into bands stored in AudioFingerprintBand, so near-identical
+    tracks can be found by an indexed lookup on any matching band.
+    """
+
+    audio_file = models.OneToOneField(
+        AudioFile, related_name="fingerprint", on_delete=models.CASCADE
+    )
+    hash = models.CharField(max_length=96)
+    duration = models.FloatField()
+
+
+class AudioFingerprintBand(models.Model):
+    fingerprint = models.ForeignKey(
+        AudioFingerprint, related_name="bands", on_delete=models.CASCADE
+    )
+    band = models.PositiveSmallIntegerField()
+    value = models.CharField(max_length=8)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band", "value"], name="fingerprint_band_idx")
+        ]
+
+
+class TranscriptCache(models.Model):
+    """
+    Transcription output for an exact audio file content, reused by later runs.
+
+    ``key`` covers both the content hash and the transcription settings, so a
+    different model or parameters never reads another run's result.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    # zlib-compressed msgpack of column lists (see audojifactory.pipeline)
+    transcript = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+def get_rendition_upload_path(instance, filename):
+    # Next to the segment's original file
+    segment_dir = os.path.dirname(instance.segment.segment_file.name)
+    return f"{segment_dir}/renditions/{filename}"
+
+
+class SegmentRendition(models.Model):
+    """
+    A transcoded copy of a segment's file for a rendition profile (see
+    audojifactory.renditions), made on first request or ahead of time for
+    popular segments. Least recently used renditions are evicted to keep the
+    total size under settings.RENDITION_CACHE_BYTES.
+    """
+
+    segment = models.ForeignKey(
+        AudioSegment, related_name="renditions", on_delete=models.CASCADE
+    )
+    profile = models.CharField(max_length=20)
+    file = models.FileField(upload_to=get_rendition_upload_path)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ("segment", "profile")
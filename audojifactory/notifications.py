@@ -0,0 +1,182 @@
+import asyncio
+import functools
+
+import msgpack
+import orjson
+import redis
+from channels.layers import get_channel_layer
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.redis_client import get_redis
+
+logger = configure_logger(__name__)
+
+MAX_BATCH_SIZE = 20
+MAX_BATCH_DELAY = 1.0  # seconds
+
+# Segment batches kept per group for replay (approximate, trimmed by Redis)
+EVENT_STREAM_MAXLEN = 1000
+PRESENCE_TTL = 60 * 60 * 24  # 1 day
+
+
+def event_stream_key(group_name):
+    return f"audoji:events:{group_name}"
+
+
+def presence_key(group_name):
+    return f"audoji:presence:{group_name}"
+
+
+def parse_offset(offset):
+    """Turn a stream id such as "1718000000000-3" into a comparable tuple."""
+    milliseconds, _, sequence = offset.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def encode_segment_batch(segments, offset=None):
+    """
+    The channel-layer form of a batch: one msgpack batch frame, carrying the
+    stream offset a reconnecting client can replay from. It is sent as is to
+    msgpack connections; see segment_batch_frames for the others.
+    """
+    return {
+        "offset": offset,
+        "batch_msgpack": msgpack.packb({"offset": offset, "segments": segments}),
+    }
+
+
+@functools.lru_cache(maxsize=16)
+def segment_batch_frames(batch_msgpack, frame_format):
+    """
+    The text frames of a batch for a JSON frame format, decoded and encoded
+    once per process however many of its connections are in the group.
+    """
+    batch = msgpack.unpackb(batch_msgpack)
+    if frame_format == "json-batch":
+        return (orjson.dumps(batch).decode(),)
+    segments = batch["segments"]
+    if segments and batch["offset"] is not None:
+        # The last segment of a batch carries the offset to replay from
+        segments = [*segments[:-1], {**segments[-1], "offset": batch["offset"]}]
+    return tuple(orjson.dumps(segment).decode() for segment in segments)
+
+
+async def append_segment_event(group_name, segments):
+    """Append a batch to the group's bounded stream and return its offset."""
+    try:
+        offset = await get_redis().xadd(
+            event_stream_key(group_name),
+            {"segments": msgpack.packb(segments)},
+            maxlen=EVENT_STREAM_MAXLEN,
+            approximate=True,
+        )
+        return offset.decode()
+    except redis.RedisError as e:
+        logger.error(f"Could not append segment event for {group_name}: {e}")
+        return None
+
+
+async def read_segment_events(group_name, offset):
+    """Return [(offset, segments), ...] for batches after the given offset."""
+    try:
+        entries = await get_redis().xrange(
+            event_stream_key(group_name), min=f"({offset}", count=EVENT_STREAM_MAXLEN
+        )
+    except redis.RedisError as e:
+        logger.error(f"Could not replay segment events for {group_name}: {e}")
+        return []
+    return [
+        (entry_id.decode(), msgpack.unpackb(fields[b"segments"]))
+        for entry_id, fields in entries
+    ]
+
+
+async def add_subscriber(group_name, channel_name):
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.sadd(presence_key(group_name), channel_name)
+            pipe.expire(presence_key(group_name), PRESENCE_TTL)
+            await pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Could not record presence for {group_name}: {e}")
+
+
+async def remove_subscriber(group_name, channel_name):
+    try:
+        await get_redis().srem(presence_key(group_name), channel_name)
+    except redis.RedisError as e:
+        logger.error(f"Could not clear presence for {group_name}: {e}")
+
+
+async def has_subscribers(group_name):
+    try:
+        return await get_redis().scard(presence_key(group_name)) > 0
+    except redis.RedisError as e:
+        logger.error(f"Could not check presence for {group_name}: {e}")
+        # Fail open: sending to an empty group is cheaper than dropping events
+        return True
+
+
+class SegmentNotificationBatcher:
+    """
+    Collects segment events for one group and sends them as a single
+    ``audio.segments`` channel-layer message once ``max_batch_size`` events are
+    pending or ``max_batch_delay`` seconds have passed since the first one.
+
+    Every batch is appended to the group's Redis stream for replay on reconnect;
+    the live send is skipped while nobody is subscribed to the group. Flushes
+    are serialized with a lock, so batches reach the group in the order their
+    segments were added.
+    """
+
+    def __init__(
+        self, group_name, max_batch_size=MAX_BATCH_SIZE, max_batch_delay=MAX_BATCH_DELAY
+    ):
+        self.group_name = group_name
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.pending = []
+        self.flush_lock = asyncio.Lock()
+        self.flush_timer = None
+
+    async def add(self, segment_data):
+        if not self.group_name:
+            return
+
+        self.pending.append(segment_data)
+        if len(self.pending) >= self.max_batch_size:
+            await self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.create_task(self.flush_after_delay())
+
+    async def flush_after_delay(self):
+        await asyncio.sleep(self.max_batch_delay)
+        self.flush_timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            segments, self.pending = self.pending, []
+
+            # Append before checking presence: a client that subscribes after the
+            # check replays from the stream and still sees this batch
+            offset = await append_segment_event(self.group_name, segments)
+            if offset is not None and not await has_subscribers(self.group_name):
+                logger.info(f"No subscribers on {self.group_name}, stored {offset}")
+                return
+
+            channel_layer = get_channel_layer()
+            await channel_layer.group_send(
+                self.group_name,
+                {"type": "audio.segments", **encode_segment_batch(segments, offset)},
+            )
+            logger.info(f"Sent {len(segments)} segments to {self.group_name}")
+
+    async def close(self):
+        """Cancel the pending timer and send whatever is still buffered."""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        await self.flush()
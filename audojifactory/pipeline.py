@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import io
+import json
+import shutil
+import uuid
+import zlib
+
+import msgpack
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from pydub import AudioSegment as AudioSegmentCreator
+
+from audojiengine.logging_config import configure_logger
+from audojifactory.models import TranscriptCache
+from audojifactory.waveform import (
+    FILE_PEAK_BUCKETS,
+    SEGMENT_PEAK_BUCKETS,
+    clip_samples,
+    compute_peaks,
+    pcm_samples,
+)
+
+logger = configure_logger(__name__)
+
+# Stages hand each other names in this storage rather than bytes. It must be
+# shared by every worker that runs a stage (e.g. the /code volume in compose).
+scratch_storage = FileSystemStorage(location=settings.PIPELINE_SCRATCH_DIR)
+
+UPLOAD_ATTEMPTS = 3
+UPLOAD_RETRY_DELAY = 1.0  # seconds, doubled after every failed attempt
+
+
+def new_job(audio_file_id, model_type, group_name, owner, priority):
+    return {
+        "job_id": f"{audio_file_id}-{uuid.uuid4().hex[:8]}",
+        "audio_file_id": audio_file_id,
+        "model_type": model_type,
+        "group_name": group_name,
+        "owner": owner,
+        "priority": priority,
+    }
+
+
+def save_scratch(job, filename, content):
+    """Store a file for the next stage and return its scratch reference."""
+    return scratch_storage.save(f"{job['job_id']}/{filename}", content)
+
+
+def scratch_path(ref):
+    return scratch_storage.path(ref)
+
+
+def delete_scratch(job):
+    shutil.rmtree(scratch_storage.path(job["job_id"]), ignore_errors=True)
+
+
+def save_transcript(job, transcript):
+    return save_scratch(
+        job, "transcript.json", io.BytesIO(json.dumps(transcript).encode())
+    )
+
+
+def load_transcript(ref):
+    with scratch_storage.open(ref, "rb") as transcript_file:
+        return json.load(transcript_file)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Bumped whenever the stored transcript's shape changes, so older cache entries
+# are not reused (2: words carry probabilities)
+TRANSCRIPT_FORMAT_VERSION = 2
+
+
+def transcript_cache_key(content_hash, backend):
+    params = orjson.dumps(
+        {**backend.cache_settings(), "format": TRANSCRIPT_FORMAT_VERSION},
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return hashlib.sha256(content_hash.encode() + params).hexdigest()
+
+
+def pack_transcript(transcript):
+    # Column lists instead of one dict per row: no repeated keys to store
+    segments, words = transcript["segments"], transcript["words"]
+    columns = {
+        "segments": [
+            [segment["start"] for segment in segments],
+            [segment["end"] for segment in segments],
+            [segment["text"] for segment in segments],
+        ],
+        "words": [
+            [word["start"] for word in words],
+            [word["end"] for word in words],
+            [word["word"] for word in words],
+            [word.get("probability") for word in words],
+        ],
+    }
+    return zlib.compress(msgpack.packb(columns))
+
+
+def unpack_transcript(data):
+    columns = msgpack.unpackb(zlib.decompress(data))
+    return {
+        "segments": [
+            {"start": start, "end": end, "text": text}
+            for start, end, text in zip(*columns["segments"])
+        ],
+        "words": [
+            {"start": start, "end": end, "word": word, "probability": probability}
+            for start, end, word, probability in zip(*columns["words"])
+        ],
+    }
+
+
+async def load_cached_transcript(key):
+    cached = await TranscriptCache.objects.filter(key=key).afirst()
+    if cached is None:
+        return None
+    return unpack_transcript(bytes(cached.transcript))
+
+
+async def store_cached_transcript(key, content_hash, transcript):
+    await TranscriptCache.objects.aupdate_or_create(
+        key=key,
+        defaults={
+            "content_hash": content_hash,
+            "transcript": pack_transcript(transcript),
+        },
+    )
+
+
+def cut_segments(job, source_path, segments, on_progress=None):
+    """
+    Decode the song once and export every segment to scratch, computing the
+    waveform peaks of the song and of every segment from the same PCM.
+
+    ``segments`` is a list of (segment_id, start_seconds, end_seconds). Returns
+    the song duration in seconds, a list of (segment_id, scratch_ref), the
+    song's peaks and a dict of segment_id -> peaks.
+    ``on_progress(done, total)`` is called after each export.
+    """
+    audio = AudioSegmentCreator.from_file(source_path)
+    samples, full_scale = pcm_samples(audio)
+    file_peaks = compute_peaks(samples, audio.channels, full_scale, FILE_PEAK_BUCKETS)
+
+    encoded = []
+    segment_peaks = {}
+    for segment_id, start, end in segments:
+        segment_file = io.BytesIO()
+        audio[start * 1000 : end * 1000].export(
+            segment_file, format="mp3", bitrate="192k"
+        )
+        segment_file.seek(0)
+        encoded.append(
+            (segment_id, save_scratch(job, f"segment_{segment_id}.mp3", segment_file))
+        )
+        segment_peaks[segment_id] = compute_peaks(
+            clip_samples(samples, audio, start, end),
+            audio.channels,
+            full_scale,
+            SEGMENT_PEAK_BUCKETS,
+        )
+        if on_progress is not None:
+            on_progress(len(encoded), len(segments))
+    return len(audio) / 1000.0, encoded, file_peaks, segment_peaks
+
+
+def upload_file(storage, name, path, max_length=None):
+    """Save a local file to storage; returns the key it was stored under."""
+    with open(path, "rb") as source:
+        return storage.save(name, File(source), max_length=max_length)
+
+
+async def upload_files(
+    storage, uploads, concurrency, on_progress=None, max_length=None
+):
+    """
+    Upload many local files at once, at most ``concurrency`` at a time, so a
+    song's upload takes about as long as its slowest file rather than the sum
+    of all of them. Each file is retried UPLOAD_ATTEMPTS times.
+
+    ``uploads`` is a list of (name, path). Returns the stored keys in the same
+    order. ``await on_progress(done, total)`` is called after each upload.
+    If any file fails (or the call is cancelled) the other uploads are
+    cancelled and every file already stored is deleted before re-raising.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    uploaded = 0
+    stored = []
+
+    async def save(name, path):
+        saving = asyncio.ensure_future(
+            sync_to_async(upload_file, thread_sensitive=False)(
+                storage, name, path, max_length
+            )
+        )
+        try:
+            key = await asyncio.shield(saving)
+        except asyncio.CancelledError:
+            # The thread cannot be stopped, so wait for its file to clean it up
+            try:
+                stored.append(await saving)
+            except Exception:
+                pass
+            raise
+        stored.append(key)
+        return key
+
+    async def upload(name, path):
+        nonlocal uploaded
+        async with semaphore:
+            for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+                try:
+                    key = await save(name, path)
+                    break
+                except Exception as e:
+                    if attempt == UPLOAD_ATTEMPTS:
+                        raise
+                    logger.warning(f"Upload of {name} failed, retrying: {e}")
+                    await asyncio.sleep(UPLOAD_RETRY_DELAY * 2 ** (attempt - 1))
+        uploaded += 1
+        if on_progress is not None:
+            await on_progress(uploaded, len(uploads))
+        return key
+
+    tasks = [asyncio.ensure_future(upload(name, path)) for name, path in uploads]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await sync_to_async(delete_files, thread_sensitive=False)(storage, stored)
+        raise
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logger.error(f"Could not delete {name} after a failed upload: {e}")
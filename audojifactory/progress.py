@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+import msgpack
+import orjson
+import redis
+from channels.layers import get_channel_layer
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.redis_client import get_redis
+from audojifactory.notifications import has_subscribers
+
+logger = configure_logger(__name__)
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+TRANSCRIBING = "transcribing"
+REFINING = "refining"
+CATEGORIZING = "categorizing"
+CUTTING = "cutting"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+
+# Stages that take time, in pipeline order
+TIMED_STAGES = (
+    DOWNLOADING,
+    TRANSCRIBING,
+    REFINING,
+    CATEGORIZING,
+    CUTTING,
+    UPLOADING,
+)
+
+# Count updates within a stage are sent at most this often per job; stage
+# changes always go out
+MIN_UPDATE_INTERVAL = 2.0  # seconds
+
+# Seconds of work per second of audio, used until a stage has been measured
+DEFAULT_STAGE_RATES = {
+    DOWNLOADING: 0.02,
+    TRANSCRIBING: 0.5,
+    REFINING: 0.01,
+    CATEGORIZING: 0.2,
+    CUTTING: 0.05,
+    UPLOADING: 0.05,
+}
+STAGE_RATES_KEY = "audoji:stage-rates"
+# Weight of the newest measurement in the moving average
+RATE_SMOOTHING = 0.2
+
+UPDATE_RATE_SCRIPT = """
+local sample = tonumber(ARGV[2])
+local current = tonumber(redis.call("HGET", KEYS[1], ARGV[1]))
+if current then
+    sample = current + tonumber(ARGV[3]) * (sample - current)
+end
+redis.call("HSET", KEYS[1], ARGV[1], tostring(sample))
+return 1
+"""
+
+
+def rate_field(stage, model_type):
+    return f"{stage}:{model_type}"
+
+
+async def get_stage_rates(model_type):
+    fields = [rate_field(stage, model_type) for stage in TIMED_STAGES]
+    try:
+        values = await get_redis().hmget(STAGE_RATES_KEY, fields)
+    except redis.RedisError as e:
+        logger.error(f"Could not read stage rates: {e}")
+        values = [None] * len(fields)
+    return {
+        stage: float(value) if value is not None else DEFAULT_STAGE_RATES[stage]
+        for stage, value in zip(TIMED_STAGES, values)
+    }
+
+
+async def record_stage_rate(stage, model_type, seconds_per_audio_second):
+    try:
+        await get_redis().eval(
+            UPDATE_RATE_SCRIPT,
+            1,
+            STAGE_RATES_KEY,
+            rate_field(stage, model_type),
+            seconds_per_audio_second,
+            RATE_SMOOTHING,
+        )
+    except redis.RedisError as e:
+        logger.error(f"Could not record stage rate: {e}")
+
+
+def estimate_remaining(rates, stage, audio_duration, elapsed, fraction_done):
+    """Seconds left: the rest of the current stage plus every later stage."""
+    stage_index = TIMED_STAGES.index(stage)
+    expected = rates[stage] * audio_duration
+    if fraction_done:
+        current = expected * (1 - fraction_done)
+    else:
+        current = max(expected - elapsed, 0.0)
+    later = sum(rates[s] * audio_duration for s in TIMED_STAGES[stage_index + 1 :])
+    return current + later
+
+
+async def send_progress(job, stage, completed=None, total=None, eta=None):
+    group_name = job.get("group_name")
+    if not group_name or not await has_subscribers(group_name):
+        return
+
+    progress = {
+        "job_id": job["job_id"],
+        "audio_file_id": job["audio_file_id"],
+        "stage": stage,
+        "completed": completed,
+        "total": total,
+        "eta": round(eta, 1) if eta is not None else None,
+        "timestamp": time.time(),
+    }
+    try:
+        await get_channel_layer().group_send(
+            group_name,
+            {
+                "type": "audio.progress",
+                "progress_json": orjson.dumps({"progress": progress}).decode(),
+                "progress_msgpack": msgpack.packb({"progress": progress}),
+            },
+        )
+    except Exception as e:
+        logger.error(f"Could not send progress for job {job['job_id']}: {e}")
+
+
+class StageProgress:
+    """
+    Progress of one pipeline stage for one job.
+
+    Sends the stage change when the stage starts and throttled ``n/N`` updates
+    while it runs, each with an ETA from the measured per-stage throughput. On
+    finish, the stage's seconds per second of audio feed the moving average.
+    """
+
+    def __init__(self, job, stage):
+        self.job = job
+        self.stage = stage
+        self.loop = None
+        self.rates = None
+        self.started_at = None
+        self.last_sent_at = 0.0
+
+    @property
+    def audio_duration(self):
+        return self.job.get("audio_duration")
+
+    def eta(self, fraction_done=None):
+        if not self.audio_duration or self.rates is None:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return estimate_remaining(
+            self.rates, self.stage, self.audio_duration, elapsed, fraction_done
+        )
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.started_at = time.monotonic()
+        self.rates = await get_stage_rates(self.job["model_type"])
+        await send_progress(self.job, self.stage, eta=self.eta())
+        self.last_sent_at = self.started_at
+
+    async def update(self, completed, total):
+        now = time.monotonic()
+        if completed < total and now - self.last_sent_at < MIN_UPDATE_INTERVAL:
+            return
+        self.last_sent_at = now
+        await send_progress(
+            self.job, self.stage, completed, total, self.eta(completed / total)
+        )
+
+    def update_threadsafe(self, completed, total):
+        """Report progress from a worker thread running part of the stage."""
+        asyncio.run_coroutine_threadsafe(self.update(completed, total), self.loop)
+
+    async def finish(self):
+        if self.audio_duration:
+            elapsed = time.monotonic() - self.started_at
+            await record_stage_rate(
+                self.stage, self.job["model_type"], elapsed / self.audio_duration
+            )
@@ -0,0 +1,153 @@
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.utils import timezone
+from pydub import AudioSegment as AudioSegmentCreator
+
+from audojiengine.logging_config import configure_logger
+from audojifactory.models import SegmentRendition, UserSelectedAudoji
+
+logger = configure_logger(__name__)
+
+# The pipeline's own export (cut_segments) is the mp3-192k rendition
+ORIGINAL_RENDITION = "mp3-192k"
+RENDITION_PROFILES = {
+    "opus-32k": {"format": "opus", "codec": "libopus", "bitrate": "32k"},
+    "aac-64k": {"format": "adts", "codec": "aac", "bitrate": "64k"},
+    ORIGINAL_RENDITION: {"format": "mp3", "codec": None, "bitrate": "192k"},
+}
+RENDITION_EXTENSIONS = {"opus": "opus", "adts": "aac", "mp3": "mp3"}
+# Network classes as reported by browsers (navigator.connection.effectiveType),
+# plus wifi for native clients
+NETWORK_RENDITIONS = {
+    "slow-2g": "opus-32k",
+    "2g": "opus-32k",
+    "3g": "aac-64k",
+    "4g": ORIGINAL_RENDITION,
+    "wifi": ORIGINAL_RENDITION,
+}
+# Made ahead of time once a segment is popular
+EAGER_RENDITIONS = ("opus-32k", "aac-64k")
+
+# last_accessed is written at most this often per rendition, so serving a hot
+# segment does not mean a database write per play
+TOUCH_INTERVAL = timedelta(hours=1)
+
+
+def resolve_rendition(profile=None, network=None):
+    """Profile name for an explicit ?rendition= or a ?network= class, or None."""
+    if profile in RENDITION_PROFILES:
+        return profile
+    return NETWORK_RENDITIONS.get(network)
+
+
+def transcode_segment(segment, profile):
+    """Transcode a segment's original file; returns the encoded bytes."""
+    options = RENDITION_PROFILES[profile]
+    with segment.segment_file.open("rb") as original:
+        audio = AudioSegmentCreator.from_file(original)
+    rendition_file = io.BytesIO()
+    audio.export(
+        rendition_file,
+        format=options["format"],
+        codec=options["codec"],
+        bitrate=options["bitrate"],
+    )
+    return rendition_file.getvalue()
+
+
+async def get_or_create_rendition(segment, profile):
+    """
+    Return (rendition, created) for a segment and a transcoded profile,
+    transcoding on first request. Concurrent first requests may both
+    transcode; the loser's file is deleted and the winner's row returned.
+    """
+    rendition = await SegmentRendition.objects.filter(
+        segment=segment, profile=profile
+    ).afirst()
+    if rendition is not None:
+        now = timezone.now()
+        if now - rendition.last_accessed > TOUCH_INTERVAL:
+            rendition.last_accessed = now
+            await rendition.asave(update_fields=["last_accessed"])
+        return rendition, False
+
+    content = await sync_to_async(transcode_segment, thread_sensitive=False)(
+        segment, profile
+    )
+    extension = RENDITION_EXTENSIONS[RENDITION_PROFILES[profile]["format"]]
+    rendition = SegmentRendition(segment=segment, profile=profile, size=len(content))
+    await sync_to_async(rendition.file.save, thread_sensitive=False)(
+        f"segment_{segment.id}.{profile}.{extension}",
+        ContentFile(content),
+        save=False,
+    )
+    try:
+        await rendition.asave()
+    except IntegrityError:
+        await sync_to_async(rendition.file.delete, thread_sensitive=False)(save=False)
+        rendition = await SegmentRendition.objects.aget(
+            segment=segment, profile=profile
+        )
+        return rendition, False
+    return rendition, True
+
+
+def delete_renditions(segment):
+    """
+    Drop a segment's renditions and their files, for when its segment_file is
+    replaced; they are transcoded from the new file on next request.
+    """
+    for rendition in SegmentRendition.objects.filter(segment=segment):
+        rendition.file.delete(save=False)
+        rendition.delete()
+
+
+async def find_newly_popular(segment_ids):
+    """
+    Of the just-selected segments, those at or past the popularity mark that
+    are still missing an eager rendition.
+    """
+    has_all_renditions = Q()
+    for profile in EAGER_RENDITIONS:
+        has_all_renditions &= Q(
+            Exists(
+                SegmentRendition.objects.filter(
+                    segment_id=OuterRef("audio_segment_id"), profile=profile
+                )
+            )
+        )
+    return [
+        row["audio_segment_id"]
+        async for row in UserSelectedAudoji.objects.filter(
+            audio_segment_id__in=segment_ids
+        )
+        .exclude(has_all_renditions)
+        .values("audio_segment_id")
+        .annotate(selections=Count("id"))
+        .filter(selections__gte=settings.RENDITION_POPULAR_SELECTIONS)
+    ]
+
+
+def evict_renditions():
+    """Delete least recently used renditions until the cache fits its budget."""
+    total = SegmentRendition.objects.aggregate(total=Sum("size"))["total"] or 0
+    excess = total - settings.RENDITION_CACHE_BYTES
+    if excess <= 0:
+        return 0
+
+    evicted = 0
+    for rendition in SegmentRendition.objects.order_by("last_accessed").iterator():
+        if excess <= 0:
+            break
+        rendition.file.delete(save=False)
+        rendition.delete()
+        excess -= rendition.size
+        evicted += 1
+    logger.info(f"Evicted {evicted} segment renditions")
+    return evicted
@@ -0,0 +1,120 @@
+import json
+import time
+
+from django.conf import settings
+
+from audojiengine.redis_client import get_redis
+
+# Priority classes, served strictly in this order
+INTERACTIVE = 0
+DEFAULT = 1
+BULK = 2
+PRIORITIES = (INTERACTIVE, DEFAULT, BULK)
+
+# The hash tag puts every scheduler key in one Redis Cluster slot, so the
+# scripts may reach the per-owner keys derived from the keys they are passed
+KEY_PREFIX = "audoji:{sched}:"
+RUNNING_KEY = f"{KEY_PREFIX}running"
+
+# Keys (relative to KEY_PREFIX):
+#   queue:<priority>:<owner>  list of pending job JSON for one owner
+#   queue:<priority>          round-robin ring of owners with pending jobs
+#   running / running:<owner> sorted sets of admitted job ids scored by lease time
+# An owner is in a ring exactly when its queue for that class is non-empty.
+
+
+def ring_key(priority):
+    return f"{KEY_PREFIX}queue:{priority}"
+
+
+# KEYS = [ring], ARGV = [owner, job]
+ENQUEUE_SCRIPT = """
+if redis.call("RPUSH", KEYS[1] .. ":" .. ARGV[1], ARGV[2]) == 1 then
+    redis.call("RPUSH", KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# Pops the next admissible job: highest priority class first, owners in
+# round-robin order within a class, skipping owners at their concurrency cap.
+# Expired leases (crashed workers) are dropped before counting.
+# KEYS = [running, ring per class in priority order]
+# ARGV = [now, lease, owner cap, global cap]
+ADMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local owner_cap = tonumber(ARGV[3])
+local global_cap = tonumber(ARGV[4])
+local running = KEYS[1]
+
+redis.call("ZREMRANGEBYSCORE", running, "-inf", now - lease)
+if redis.call("ZCARD", running) >= global_cap then
+    return false
+end
+
+for i = 2, #KEYS do
+    local ring = KEYS[i]
+    for _ = 1, redis.call("LLEN", ring) do
+        local owner = redis.call("LPOP", ring)
+        local owner_running = running .. ":" .. owner
+        redis.call("ZREMRANGEBYSCORE", owner_running, "-inf", now - lease)
+
+        if redis.call("ZCARD", owner_running) < owner_cap then
+            local queue = ring .. ":" .. owner
+            local job = redis.call("LPOP", queue)
+            if redis.call("LLEN", queue) > 0 then
+                redis.call("RPUSH", ring, owner)
+            end
+            if job then
+                local job_id = cjson.decode(job)["job_id"]
+                redis.call("ZADD", owner_running, now, job_id)
+                redis.call("ZADD", running, now, job_id)
+                return job
+            end
+        else
+            redis.call("RPUSH", ring, owner)
+        end
+    end
+end
+return false
+"""
+
+
+async def enqueue_job(job):
+    await get_redis().eval(
+        ENQUEUE_SCRIPT, 1, ring_key(job["priority"]), job["owner"], json.dumps(job)
+    )
+
+
+async def admit_jobs():
+    """Pop every job that may start now under the fairness and concurrency rules."""
+    keys = [RUNNING_KEY, *(ring_key(priority) for priority in PRIORITIES)]
+    jobs = []
+    while True:
+        job = await get_redis().eval(
+            ADMIT_SCRIPT,
+            len(keys),
+            *keys,
+            time.time(),
+            settings.PIPELINE_JOB_LEASE,
+            settings.PIPELINE_MAX_RUNNING_JOBS_PER_USER,
+            settings.PIPELINE_MAX_RUNNING_JOBS,
+        )
+        if job is None:
+            return jobs
+        jobs.append(json.loads(job))
+
+
+async def renew_job_lease(job):
+    now = time.time()
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.zadd(RUNNING_KEY, {job["job_id"]: now}, xx=True)
+        pipe.zadd(f"{RUNNING_KEY}:{job['owner']}", {job["job_id"]: now}, xx=True)
+        await pipe.execute()
+
+
+async def release_job(job):
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.zrem(RUNNING_KEY, job["job_id"])
+        pipe.zrem(f"{RUNNING_KEY}:{job['owner']}", job["job_id"])
+        await pipe.execute()
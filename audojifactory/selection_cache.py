@@ -0,0 +1,120 @@
+import redis
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.redis_client import get_redis
+from audojifactory.models import UserSelectedAudoji
+
+logger = configure_logger(__name__)
+
+SELECTION_CACHE_TTL = 60 * 60 * 24  # 1 day
+
+# Always present in a warmed set, so an empty selection is not mistaken for a miss
+WARM_MARKER = b"warm"
+
+# Every write bumps the user's version, then patches the set if it is warm; a
+# cold set is loaded from the database (which already has the write) on its
+# next read.
+# KEYS = [set, version], ARGV = [ttl, number of added ids, *added, *removed]
+UPDATE_IF_WARM_SCRIPT = """
+redis.call("INCR", KEYS[2])
+redis.call("EXPIRE", KEYS[2], ARGV[1])
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+local added = tonumber(ARGV[2])
+for i = 3, added + 2 do
+    redis.call("SADD", KEYS[1], ARGV[i])
+end
+for i = added + 3, #ARGV do
+    redis.call("SREM", KEYS[1], ARGV[i])
+end
+return 1
+"""
+
+# Store a set loaded from the database only if no write bumped the version
+# since the load started; otherwise the load may have missed that write.
+# KEYS = [set, version], ARGV = [version seen before loading, ttl, *ids]
+WARM_IF_UNCHANGED_SCRIPT = """
+if (redis.call("GET", KEYS[2]) or "0") ~= ARGV[1] then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+for i = 3, #ARGV do
+    redis.call("SADD", KEYS[1], ARGV[i])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def selection_key(user_id):
+    # Hash tag keeps the set and its version in one cluster slot
+    return f"audoji:selected:{{{user_id}}}"
+
+
+def selection_version_key(user_id):
+    return f"audoji:selected-version:{{{user_id}}}"
+
+
+async def load_selected_segment_ids(user_id):
+    return {
+        segment_id
+        async for segment_id in UserSelectedAudoji.objects.filter(
+            user_id=user_id
+        ).values_list("audio_segment_id", flat=True)
+    }
+
+
+async def get_selected_segment_ids(user_id):
+    """Return the user's selected segment ids, warming the Redis set on a miss."""
+    if not user_id:
+        return frozenset()
+
+    key = selection_key(user_id)
+    version_key = selection_version_key(user_id)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.smembers(key)
+            pipe.get(version_key)
+            members, version = await pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Selection cache read failed for user {user_id}: {e}")
+        return frozenset(await load_selected_segment_ids(user_id))
+
+    if members:
+        return frozenset(int(m) for m in members if m != WARM_MARKER)
+
+    selected = await load_selected_segment_ids(user_id)
+    try:
+        await get_redis().eval(
+            WARM_IF_UNCHANGED_SCRIPT,
+            2,
+            key,
+            version_key,
+            version or b"0",
+            SELECTION_CACHE_TTL,
+            WARM_MARKER,
+            *selected,
+        )
+    except redis.RedisError as e:
+        logger.error(f"Selection cache warm failed for user {user_id}: {e}")
+    return frozenset(selected)
+
+
+async def update_selected_segments(user_id, added=(), removed=()):
+    """Apply selection changes to the user's cached set in one atomic step."""
+    if not added and not removed:
+        return
+    try:
+        await get_redis().eval(
+            UPDATE_IF_WARM_SCRIPT,
+            2,
+            selection_key(user_id),
+            selection_version_key(user_id),
+            SELECTION_CACHE_TTL,
+            len(added),
+            *added,
+            *removed,
+        )
+    except redis.RedisError as e:
+        logger.error(f"Selection cache write failed for user {user_id}: {e}")
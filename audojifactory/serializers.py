@@ -1,7 +1,11 @@
+from django.db import models
+from django.urls import reverse
 from rest_framework import serializers
 
 from audojifactory.models import AudioFile, AudioSegment, Category, UserSelectedAudoji
+from audojifactory.renditions import ORIGINAL_RENDITION, resolve_rendition
 from audojifactory.utils import seconds_to_minutes
+from audojifactory.waveform import encode_peaks
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -10,7 +14,92 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
-class AudioFileSerializer(serializers.ModelSerializer):
+class PresignedUrlListSerializer(serializers.ListSerializer):
+    """
+    Signs the URLs of every file in the list in one batch before the rows are
+    serialized, for storages that support it (MediaStorage.urls). Each row's
+    ``.url`` is then a cache hit.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        for field in self.child.fields.values():
+            if not isinstance(field, serializers.FileField):
+                continue
+            names_by_storage = {}
+            for instance in instances:
+                file = getattr(instance, field.source)
+                if file and hasattr(file.storage, "urls"):
+                    names_by_storage.setdefault(file.storage, []).append(file.name)
+            for storage, names in names_by_storage.items():
+                storage.urls(names)
+        return super().to_representation(instances)
+
+
+class WaveformPeaksMixin:
+    """
+    Adds ``waveform_peaks`` (base64 of int8 min/max pairs) only when asked for,
+    with ?waveform=1 on the request or ``waveform`` in the context, since the
+    peaks are most of the payload.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.wants_waveform():
+            fields.pop("waveform_peaks", None)
+        return fields
+
+    def wants_waveform(self):
+        if self.context.get("waveform"):
+            return True
+        request = self.context.get("request")
+        if request and hasattr(request, "query_params"):
+            return request.query_params.get("waveform") in ("1", "true")
+        return False
+
+    def get_waveform_peaks(self, obj):
+        return encode_peaks(obj.waveform_peaks)
+
+
+class RenditionUrlMixin:
+    """
+    Adds ``rendition_url`` when the request picks a rendition with ?rendition=
+    (opus-32k, aac-64k, mp3-192k) or a network class with ?network= (slow-2g,
+    2g, 3g, 4g, wifi). Transcoded renditions point at the rendition endpoint,
+    which makes them on first play, so listing segments never transcodes.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.get_rendition() is None:
+            fields.pop("rendition_url", None)
+        return fields
+
+    def get_rendition(self):
+        request = self.context.get("request")
+        if request is None or not hasattr(request, "query_params"):
+            return None
+        return resolve_rendition(
+            request.query_params.get("rendition"),
+            request.query_params.get("network"),
+        )
+
+    def get_rendition_url(self, obj):
+        if not obj.segment_file:
+            return None
+        profile = self.get_rendition()
+        if profile == ORIGINAL_RENDITION:
+            return obj.segment_file.url
+        path = reverse("audiosegment_rendition", args=[obj.id])
+        return self.context["request"].build_absolute_uri(
+            f"{path}?rendition={profile}"
+        )
+
+
+class AudioFileSerializer(WaveformPeaksMixin, serializers.ModelSerializer):
+    waveform_peaks = serializers.SerializerMethodField()
+
     class Meta:
         model = AudioFile
         fields = [
@@ -22,15 +111,21 @@ class AudioFileSerializer(serializers.ModelSerializer):
             "cover_image",
             "terms_condition",
             "spotify_link",
+            "waveform_peaks",
         ]
+        list_serializer_class = PresignedUrlListSerializer
 
 
-class AudioSegmentSerializer(serializers.ModelSerializer):
+class AudioSegmentSerializer(
+    RenditionUrlMixin, WaveformPeaksMixin, serializers.ModelSerializer
+):
     is_selected = serializers.SerializerMethodField()
     audio_full_duration_minutes = serializers.SerializerMethodField()
     start_time_minutes = serializers.SerializerMethodField()
     end_time_minutes = serializers.SerializerMethodField()
     categories = CategorySerializer(many=True, read_only=True)
+    waveform_peaks = serializers.SerializerMethodField()
+    rendition_url = serializers.SerializerMethodField()
 
     class Meta:
         model = AudioSegment
@@ -46,11 +141,19 @@ class AudioSegmentSerializer(serializers.ModelSerializer):
             "categories",
             "is_selected",
             "audio_full_duration_minutes",
+            "waveform_peaks",
+            "rendition_url",
         ]
+        list_serializer_class = PresignedUrlListSerializer
 
     def get_is_selected(self, obj):
         # Assuming 'self.context['request'].user_id' is the way to access the user_id in your context
         # You need to ensure that 'user_id' is passed to the serializer context in your view.
+        # Views that already fetched the user's selections pass them in as a set
+        selected_segment_ids = self.context.get("selected_segment_ids")
+        if selected_segment_ids is not None:
+            return obj.id in selected_segment_ids
+
         request = self.context.get("request")
         if request and hasattr(request, "query_params"):
             user_id = request.query_params.get("user_id")
@@ -73,12 +176,13 @@ class AudioSegmentSerializer(serializers.ModelSerializer):
         return None
 
 
-class AudioSegmentSerializerWebSocket(serializers.ModelSerializer):
+class AudioSegmentSerializerWebSocket(WaveformPeaksMixin, serializers.ModelSerializer):
     is_selected = serializers.SerializerMethodField()
     audio_full_duration_minutes = serializers.SerializerMethodField()
     start_time_minutes = serializers.SerializerMethodField()
     end_time_minutes = serializers.SerializerMethodField()
     categories = CategorySerializer(many=True, read_only=True)
+    waveform_peaks = serializers.SerializerMethodField()
 
     class Meta:
         model = AudioSegment
@@ -94,9 +198,15 @@ class AudioSegmentSerializerWebSocket(serializers.ModelSerializer):
             "categories",
             "is_selected",
             "audio_full_duration_minutes",
+            "waveform_peaks",
         ]
+        list_serializer_class = PresignedUrlListSerializer
 
     def get_is_selected(self, obj):
+        selected_segment_ids = self.context.get("selected_segment_ids")
+        if selected_segment_ids is not None:
+            return obj.id in selected_segment_ids
+
         # Retrieve user_id from the serializer context directly
         user_id = self.context.get("user_id")
         if user_id:
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from audojifactory.changes import record_change
+from audojifactory.models import AudioFile, AudioSegment, UserSelectedAudoji
+
+
+@receiver(post_save, sender=AudioFile)
+@receiver(post_save, sender=AudioSegment)
+@receiver(post_save, sender=UserSelectedAudoji)
+def record_saved_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(instance)
+
+
+@receiver(post_delete, sender=AudioFile)
+@receiver(post_delete, sender=AudioSegment)
+@receiver(post_delete, sender=UserSelectedAudoji)
+def record_deleted_change(sender, instance, origin=None, **kwargs):
+    owner = None
+    # Segments deleted in cascade from their audio file take the owner from it
+    # rather than each loading the file again
+    if (
+        sender is AudioSegment
+        and isinstance(origin, AudioFile)
+        and origin.pk == instance.audio_file_id
+    ):
+        owner = origin.owner
+    record_change(instance, deleted=True, owner=owner)
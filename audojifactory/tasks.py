@@ -1,33 +1,99 @@
 import asyncio
+import functools
+import os
 
-from celery import shared_task
+import librosa
+import redis
+from asgiref.sync import sync_to_async
+from celery import chain, shared_task
+from django.conf import settings
 
+from audojiengine.async_runtime import async_task
+from audojiengine.logging_config import configure_logger
 from audojiengine.mg_database import store_data_to_audio_mgdb
 from audojifactory.audojifactories.apifactory import AudioProcessor as APIAudioProcessor
 from audojifactory.audojifactories.opensourcefactory import (
     AudioProcessor as OSAudioProcessor,
 )
-from audojifactory.audojifactories.opensourcefactory import AudioProcessorAWS
-from audojifactory.models import AudioFile
+from audojifactory.audojifactories.opensourcefactory import (
+    AudioProcessorAWS,
+    analyze_category_async,
+)
+from audojifactory.boundaries import refine_transcript_boundaries
+from audojifactory.changes import record_segment_changes
+from audojifactory.fingerprint import (
+    compute_fingerprint,
+    find_duplicate,
+    link_duplicate,
+    save_fingerprint,
+)
+from audojifactory.models import AudioFile, AudioSegment, Category
+from audojifactory.notifications import SegmentNotificationBatcher
+from audojifactory.pipeline import (
+    cut_segments,
+    delete_scratch,
+    hash_file,
+    load_cached_transcript,
+    load_transcript,
+    new_job,
+    save_scratch,
+    save_transcript,
+    scratch_path,
+    scratch_storage,
+    store_cached_transcript,
+    transcript_cache_key,
+    upload_files,
+)
+from audojifactory.progress import (
+    CATEGORIZING,
+    CUTTING,
+    DONE,
+    DOWNLOADING,
+    FAILED,
+    QUEUED,
+    REFINING,
+    TRANSCRIBING,
+    UPLOADING,
+    StageProgress,
+    send_progress,
+)
+from audojifactory.renditions import (
+    EAGER_RENDITIONS,
+    evict_renditions,
+    get_or_create_rendition,
+)
+from audojifactory.scheduling import (
+    admit_jobs,
+    enqueue_job,
+    release_job,
+    renew_job_lease,
+)
+from audojifactory.serializers import AudioSegmentSerializer
+from audojifactory.transcription import get_transcription_backend
+from audojifactory.transcription_callbacks import iter_callback_segments
 
+logger = configure_logger(__name__)
+
+CATEGORIZE_CONCURRENCY = 5
 
-@shared_task
-def task_run_async_processor(audio_file_instance_id, model_type, group_name=None):   
-    # Retrieve the audio file instance by ID
-    audio_file_instance = AudioFile.objects.get(id=audio_file_instance_id)
 
-    # Setup event loop for async function
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+@async_task()
+async def task_run_async_processor(audio_file_instance_id, model_type, group_name=None):
+    # Retrieve the audio file instance by ID
+    audio_file_instance = await AudioFile.objects.aget(id=audio_file_instance_id)
 
     if model_type == "os":
-        audio_processor = OSAudioProcessor(audio_file_instance, group_name)
+        processor_class = OSAudioProcessor
     else:
-        audio_processor = APIAudioProcessor(audio_file_instance, group_name)
+        processor_class = APIAudioProcessor
+
+    # Loading the model / downloading the audio blocks, so keep it off the loop
+    audio_processor = await sync_to_async(processor_class, thread_sensitive=False)(
+        audio_file_instance, group_name
+    )
 
-    # Run the processor asynchronously
-    loop.run_until_complete(audio_processor.run_and_save_segments())
-    loop.close()
+    # Run the processor on the worker's event loop
+    await audio_processor.run_and_save_segments()
 
 
 @shared_task
@@ -41,27 +107,378 @@ def task_run_async_processor_AWS(
     # invoke_transcription_service(audio_file_url, callback_url)
 
 
-@shared_task
-def task_run_async_complete_processing(
-    audio_file_url, transcription_result, group_name=None
+@async_task()
+async def task_run_async_complete_processing(
+    audio_file_url, transcription_ref, group_name=None
 ):
-    # Setup event loop for async function
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
+    # The callback body was spilled to scratch; segments are parsed as they're used
     audio_processor = AudioProcessorAWS(
-        audio_file_url, transcription_result, group_name
+        audio_file_url,
+        {"segments": iter_callback_segments(transcription_ref)},
+        group_name,
     )
 
-    # Run the processor asynchronously
-    loop.run_until_complete(audio_processor.run_and_save_segments())
-    loop.close()
+    try:
+        # Run the processor on the worker's event loop
+        await audio_processor.run_and_save_segments()
+    finally:
+        scratch_storage.delete(transcription_ref)
+
+
+@async_task()
+async def task_run_async_db_operation(data):
+    await store_data_to_audio_mgdb(data)
+
+
+@async_task()
+async def task_prepare_renditions(segment_ids):
+    # Popular segments get their low-bandwidth renditions before anyone asks
+    created = False
+    async for segment in AudioSegment.objects.select_related("audio_file").filter(
+        id__in=segment_ids
+    ):
+        if not segment.segment_file:
+            continue
+        for profile in EAGER_RENDITIONS:
+            try:
+                _, made = await get_or_create_rendition(segment, profile)
+                created = created or made
+            except Exception as e:
+                logger.error(f"Could not make {profile} for segment {segment.id}: {e}")
+    if created:
+        await sync_to_async(evict_renditions)()
 
 
 @shared_task
-def task_run_async_db_operation(data):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def task_evict_renditions():
+    evict_renditions()
+
+
+# ==================== Staged processing pipeline ====================
+# Each stage is a separate task routed to its own queue (CELERY_TASK_ROUTES), so
+# transcription, LLM, encoding and IO workers can be sized independently. Stages
+# pass a small JSON "job" dict holding scratch references and database ids.
+
+
+def pipeline_stage(progress_stage=None):
+    """
+    Register a pipeline stage, reported to the client as ``progress_stage``.
+
+    The stage function receives the job and its StageProgress (None for stages
+    that are not reported, or that a linked duplicate skips). A failing stage
+    clears the job's scratch files.
+    """
+
+    def decorator(stage_func):
+        @functools.wraps(stage_func)
+        async def run_stage(job):
+            try:
+                await renew_job_lease(job)
+            except redis.RedisError as e:
+                logger.error(f"Could not renew lease for job {job['job_id']}: {e}")
+
+            progress = None
+            if progress_stage is not None and not job.get("duplicate_of"):
+                progress = StageProgress(job, progress_stage)
+                await progress.start()
+
+            try:
+                job = await stage_func(job, progress)
+            except Exception:
+                logger.error(
+                    f"Pipeline stage {stage_func.__name__} failed "
+                    f"for job {job['job_id']}",
+                    exc_info=True,
+                )
+                delete_scratch(job)
+                await send_progress(job, FAILED)
+                await finish_pipeline_job(job)
+                raise
+
+            if progress is not None:
+                await progress.finish()
+            return job
+
+        return async_task()(run_stage)
+
+    return decorator
+
+
+@pipeline_stage(DOWNLOADING)
+async def stage_fetch(job, progress):
+    audio_file = await AudioFile.objects.aget(id=job["audio_file_id"])
+    extension = os.path.splitext(audio_file.audio_file.name)[1] or ".mp3"
+
+    def copy_source():
+        with audio_file.audio_file.open("rb") as source:
+            return save_scratch(job, f"source{extension}", source)
+
+    job["source"] = await sync_to_async(copy_source, thread_sensitive=False)()
+    # Lets later stages estimate their remaining time
+    job["audio_duration"] = await sync_to_async(
+        librosa.get_duration, thread_sensitive=False
+    )(path=scratch_path(job["source"]))
+
+    # A re-upload of an already processed track reuses its segments
+    try:
+        fingerprint = await sync_to_async(
+            compute_fingerprint, thread_sensitive=False
+        )(scratch_path(job["source"]))
+    except Exception as e:
+        logger.error(f"Could not fingerprint job {job['job_id']}: {e}")
+        fingerprint = None
+
+    if fingerprint is not None:
+        source = await find_duplicate(*fingerprint)
+        if source is not None and source.id != audio_file.id:
+            job["segment_ids"] = await link_duplicate(audio_file, source)
+            job["duplicate_of"] = source.id
+            logger.info(f"Job {job['job_id']} reuses audio file {source.id}")
+        else:
+            job["fingerprint"] = fingerprint
+    return job
+
+
+@pipeline_stage(TRANSCRIBING)
+async def stage_transcribe(job, progress):
+    if job.get("duplicate_of"):
+        return job
+
+    source_path = scratch_path(job["source"])
+    content_hash = await sync_to_async(hash_file, thread_sensitive=False)(source_path)
+    backend = get_transcription_backend(job["model_type"])
+    cache_key = transcript_cache_key(content_hash, backend)
+
+    transcript = await load_cached_transcript(cache_key)
+    if transcript is not None:
+        logger.info(f"Job {job['job_id']} reuses cached transcript {cache_key}")
+    else:
+        transcript = await backend.transcribe(source_path)
+        await store_cached_transcript(cache_key, content_hash, transcript)
+
+    job["transcript"] = save_transcript(job, transcript)
+    return job
+
+
+@pipeline_stage(REFINING)
+async def stage_refine(job, progress):
+    if job.get("duplicate_of"):
+        return job
+
+    # Fit segment edges to the word timestamps, then to nearby silence, before
+    # categorize stores them and encode cuts them
+    transcript = await sync_to_async(
+        refine_transcript_boundaries, thread_sensitive=False
+    )(scratch_path(job["source"]), load_transcript(job["transcript"]))
+    job["transcript"] = save_transcript(job, transcript)
+    return job
+
+
+@pipeline_stage(CATEGORIZING)
+async def stage_categorize(job, progress):
+    if job.get("duplicate_of"):
+        return job
+
+    transcript = load_transcript(job["transcript"])
+    audio_file = await AudioFile.objects.aget(id=job["audio_file_id"])
+
+    # Re-running the stage replaces the segments it created before
+    await AudioSegment.objects.filter(audio_file=audio_file).adelete()
+
+    semaphore = asyncio.Semaphore(CATEGORIZE_CONCURRENCY)
+    total = len(transcript["segments"])
+    categorized = 0
+
+    async def categorize(segment):
+        nonlocal categorized
+        async with semaphore:
+            category_names = await analyze_category_async(segment["text"])
+        categorized += 1
+        await progress.update(categorized, total)
+        return category_names
+
+    categories = await asyncio.gather(
+        *(categorize(segment) for segment in transcript["segments"])
+    )
+
+    segment_ids = []
+    for segment, category_names in zip(transcript["segments"], categories):
+        category = None
+        if category_names:
+            if isinstance(category_names, list):
+                category_names = category_names[0]
+            category, _ = await Category.objects.aget_or_create(name=category_names)
+
+        audio_segment_instance = AudioSegment(
+            audio_file=audio_file,
+            start_time=segment["start"],
+            end_time=segment["end"],
+            transcription=segment["text"],
+            category=category,
+        )
+        await audio_segment_instance.asave()
+        segment_ids.append(audio_segment_instance.id)
+
+    job["segment_ids"] = segment_ids
+    return job
+
+
+@pipeline_stage(CUTTING)
+async def stage_encode(job, progress):
+    if job.get("duplicate_of"):
+        return job
+
+    segments = [
+        segment
+        async for segment in AudioSegment.objects.select_related("audio_file").filter(
+            id__in=job["segment_ids"]
+        )
+    ]
+    duration, job["encoded"], file_peaks, segment_peaks = await sync_to_async(
+        cut_segments, thread_sensitive=False
+    )(
+        job,
+        scratch_path(job["source"]),
+        [(segment.id, segment.start_time, segment.end_time) for segment in segments],
+        progress.update_threadsafe,
+    )
+
+    for segment in segments:
+        segment.waveform_peaks = segment_peaks[segment.id]
+    await AudioSegment.objects.abulk_update(segments, ["waveform_peaks"])
+    await sync_to_async(record_segment_changes)(segments)
+
+    audio_file = await AudioFile.objects.aget(id=job["audio_file_id"])
+    audio_file.waveform_peaks = file_peaks
+    update_fields = ["waveform_peaks"]
+    if audio_file.duration is None:
+        audio_file.duration = duration
+        update_fields.append("duration")
+    await audio_file.asave(update_fields=update_fields)
+    return job
+
+
+@pipeline_stage(UPLOADING)
+async def stage_upload(job, progress):
+    if job.get("duplicate_of"):
+        return job
+
+    segments = {
+        segment.id: segment
+        async for segment in AudioSegment.objects.select_related(
+            "audio_file"
+        ).filter(id__in=job["segment_ids"])
+    }
+    # Skip segments deleted while the job was in flight
+    encoded = [
+        (segments[segment_id], ref)
+        for segment_id, ref in job["encoded"]
+        if segment_id in segments
+    ]
+
+    segment_file_field = AudioSegment._meta.get_field("segment_file")
+    keys = await upload_files(
+        segment_file_field.storage,
+        [
+            (
+                segment_file_field.generate_filename(
+                    segment, f"segment_{segment.id}.mp3"
+                ),
+                scratch_path(ref),
+            )
+            for segment, ref in encoded
+        ],
+        settings.PIPELINE_UPLOAD_CONCURRENCY,
+        on_progress=progress.update,
+        max_length=segment_file_field.max_length,
+    )
+
+    # One UPDATE for the whole song instead of a save per segment
+    uploaded_segments = [segment for segment, _ in encoded]
+    for segment, key in zip(uploaded_segments, keys):
+        segment.segment_file.name = key
+    await AudioSegment.objects.abulk_update(uploaded_segments, ["segment_file"])
+    await sync_to_async(record_segment_changes)(uploaded_segments)
+    return job
+
+
+@pipeline_stage()
+async def stage_notify(job, progress):
+    segment_notifier = SegmentNotificationBatcher(job["group_name"])
+    async for segment in (
+        AudioSegment.objects.select_related("audio_file")
+        .filter(id__in=job["segment_ids"])
+        .order_by("start_time")
+    ):
+        await segment_notifier.add(AudioSegmentSerializer(segment).data)
+    await segment_notifier.close()
+
+    if job.get("fingerprint"):
+        await sync_to_async(save_fingerprint)(job["audio_file_id"], *job["fingerprint"])
+
+    delete_scratch(job)
+    await send_progress(job, DONE, eta=0)
+    await finish_pipeline_job(job)
+    logger.info(f"Done Creating Audojis for job {job['job_id']}")
+    return job
+
+
+def start_audio_pipeline(job):
+    return chain(
+        stage_fetch.s(job),
+        stage_transcribe.s(),
+        stage_refine.s(),
+        stage_categorize.s(),
+        stage_encode.s(),
+        stage_upload.s(),
+        stage_notify.s(),
+    ).apply_async()
+
+
+# ==================== Fair scheduling ====================
+# Jobs wait in per-owner Redis queues and are admitted round-robin across owners,
+# highest priority class first, within the per-owner and global caps
+# (audojifactory.scheduling). Finishing or failing a job frees its slot and
+# admits the next ones.
+
+
+async def dispatch_pipeline_jobs():
+    for job in await admit_jobs():
+        await sync_to_async(start_audio_pipeline, thread_sensitive=False)(job)
+
+
+async def schedule_audio_pipeline(
+    audio_file_id, model_type, group_name, owner, priority
+):
+    job = new_job(audio_file_id, model_type, group_name, owner, priority)
+    try:
+        await enqueue_job(job)
+        await send_progress(job, QUEUED)
+    except redis.RedisError as e:
+        logger.error(f"Scheduler unavailable, starting job {job['job_id']}: {e}")
+        await sync_to_async(start_audio_pipeline, thread_sensitive=False)(job)
+        return
+
+    try:
+        await dispatch_pipeline_jobs()
+    except redis.RedisError as e:
+        # The job stays queued and is admitted when a running job finishes
+        logger.error(f"Could not admit pipeline jobs: {e}")
+
+
+async def finish_pipeline_job(job):
+    try:
+        await release_job(job)
+        await dispatch_pipeline_jobs()
+    except redis.RedisError as e:
+        logger.error(f"Could not release job {job['job_id']}: {e}")
+
 
-    loop.run_until_complete(store_data_to_audio_mgdb(data))
-    loop.close()
+@async_task()
+async def task_dispatch_pipeline_jobs():
+    # Run periodically (CELERY_BEAT_SCHEDULE) so slots held by crashed workers are
+    # reclaimed once their lease expires, even when no job finishes or arrives
+    try:
+        await dispatch_pipeline_jobs()
+    except redis.RedisError as e:
+        logger.error(f"Could not admit pipeline jobs: {e}")
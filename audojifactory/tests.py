@@ -1,3 +1,618 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+import numpy as np
+import orjson
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from audojifactory import scheduling, selection_cache
+from audojifactory.boundaries import (
+    refine_with_words,
+    snap_boundaries,
+    snap_to_valleys,
+)
+from audojifactory.models import (
+    AudioFile,
+    AudioSegment,
+    SegmentRendition,
+    SyncChange,
+    UserSelectedAudoji,
+)
+from audojifactory.notifications import encode_segment_batch, segment_batch_frames
+from audojifactory.pipeline import pack_transcript, unpack_transcript, upload_files
+from audojifactory.renditions import delete_renditions
+from audojifactory.waveform import compute_peaks
+
+FRAME_DURATION = 0.02
+
+
+class RefineWithWordsTests(SimpleTestCase):
+    def refine(self, probabilities, duration=10.0, word_ends=(0.9, 2.3, 4.0, 4.8)):
+        # Two segments, two words each; the second word of the first segment
+        # runs past the segment's end
+        return refine_with_words(
+            starts=[0.0, 3.0],
+            ends=[2.0, 5.0],
+            word_starts=[0.1, 1.0, 3.2, 4.1],
+            word_ends=list(word_ends),
+            word_probabilities=probabilities,
+            duration=duration,
+        )
+
+    def test_segments_cover_every_overlapping_word(self):
+        starts, ends, first_word_starts, last_word_ends = self.refine(
+            [0.9, 0.9, 0.9, 0.9]
+        )
+        np.testing.assert_allclose(starts, [0.0, 3.0])
+        np.testing.assert_allclose(ends, [2.3, 5.0])
+        np.testing.assert_allclose(first_word_starts, [0.1, 3.2])
+        np.testing.assert_allclose(last_word_ends, [2.3, 4.8])
+
+    def test_low_confidence_last_word_extends_into_gap(self):
+        starts, ends, _, _ = self.refine([0.9, 0.2, 0.9, 0.9])
+        # Halfway from the last word's end (2.3) to the next segment (3.0)
+        self.assertAlmostEqual(ends[0], 2.65)
+        # The next start is delayed, but never past its first word
+        self.assertAlmostEqual(starts[1], 3.2)
+
+    def test_medium_confidence_adds_fixed_tail(self):
+        _, ends, _, _ = self.refine(
+            [0.9, 0.5, 0.9, 0.9], word_ends=(0.9, 1.9, 4.0, 4.8)
+        )
+        self.assertAlmostEqual(ends[0], 2.5)
+
+    def test_tail_never_runs_into_next_first_word(self):
+        starts, ends, _, _ = refine_with_words(
+            starts=[0.0, 2.2],
+            ends=[2.0, 4.0],
+            word_starts=[0.5, 2.3],
+            word_ends=[1.9, 3.5],
+            word_probabilities=[0.5, 0.9],
+        )
+        self.assertAlmostEqual(ends[0], 2.3)
+
+    def test_last_segment_tail_is_capped_at_duration(self):
+        _, ends, _, _ = self.refine([0.9, 0.9, 0.9, 0.2], duration=5.5)
+        self.assertAlmostEqual(ends[1], 5.5)
+
+    def test_words_without_probability_count_as_confident(self):
+        starts, ends, _, _ = self.refine([None, None, None, None])
+        np.testing.assert_allclose(starts, [0.0, 3.0])
+        np.testing.assert_allclose(ends, [2.3, 5.0])
+
+    def test_no_words_leaves_boundaries_alone(self):
+        starts, ends, _, _ = refine_with_words([0.0, 3.0], [2.0, 5.0], [], [])
+        np.testing.assert_allclose(starts, [0.0, 3.0])
+        np.testing.assert_allclose(ends, [2.0, 5.0])
+
+    def test_no_segments(self):
+        starts, ends, _, _ = refine_with_words([], [], [0.1], [0.5])
+        self.assertEqual(starts.size, 0)
+        self.assertEqual(ends.size, 0)
+
+
+class SnapBoundariesTests(SimpleTestCase):
+    def setUp(self):
+        # Loud everywhere except a quiet valley at 1.00-1.08s and 3.00-3.08s
+        self.rms = np.ones(250)
+        self.rms[50:55] = 0.01
+        self.rms[150:155] = 0.01
+        self.duration = self.rms.size * FRAME_DURATION
+
+    def test_snaps_to_valley_within_window(self):
+        snapped = snap_to_valleys(
+            [1.2], self.rms, FRAME_DURATION, lower=[0.9], upper=[1.3]
+        )
+        self.assertTrue(1.0 <= snapped[0] <= 1.08)
+
+    def test_keeps_time_past_the_envelope(self):
+        snapped = snap_to_valleys(
+            [10.0], self.rms, FRAME_DURATION, lower=[9.9], upper=[10.1]
+        )
+        self.assertEqual(snapped[0], 10.0)
+
+    def test_start_moves_earlier_and_end_later(self):
+        starts, ends = snap_boundaries(
+            [1.15], [2.85], self.rms, FRAME_DURATION, self.duration
+        )
+        self.assertTrue(1.0 <= starts[0] <= 1.08)
+        self.assertTrue(3.0 <= ends[0] <= 3.08)
+
+    def test_snapping_respects_word_limits(self):
+        starts, ends = snap_boundaries(
+            [0.9],
+            [3.2],
+            self.rms,
+            FRAME_DURATION,
+            self.duration,
+            latest_starts=[0.95],
+            earliest_ends=[3.15],
+        )
+        self.assertLessEqual(starts[0], 0.95)
+        self.assertGreaterEqual(ends[0], 3.15)
+
+    def test_collapsing_snap_is_dropped(self):
+        # Both edges would land in the same valley
+        starts, ends = snap_boundaries(
+            [0.98], [1.12], self.rms, FRAME_DURATION, self.duration
+        )
+        self.assertEqual((starts[0], ends[0]), (0.98, 1.12))
+
+
+class TranscriptPackingTests(SimpleTestCase):
+    def test_round_trip(self):
+        transcript = {
+            "segments": [{"start": 0.0, "end": 1.5, "text": "hello"}],
+            "words": [
+                {"start": 0.1, "end": 0.6, "word": "hel", "probability": 0.8},
+                {"start": 0.6, "end": 1.4, "word": "lo", "probability": None},
+            ],
+        }
+        self.assertEqual(unpack_transcript(pack_transcript(transcript)), transcript)
+
+
+class WaveformPeaksTests(SimpleTestCase):
+    def peaks(self, samples, channels=1, buckets=4):
+        data = compute_peaks(
+            np.asarray(samples, dtype=np.int16), channels, 32768.0, buckets
+        )
+        return np.frombuffer(data, dtype=np.int8).reshape(buckets, 2)
+
+    def test_min_max_per_bucket_across_channels(self):
+        # Stereo frames: left rises, right falls
+        samples = [0, 0, 16384, -16384, 32767, -32768, 0, 0] * 4
+        peaks = self.peaks(samples, channels=2)
+        np.testing.assert_array_equal(peaks, [[-127, 127]] * 4)
+
+    def test_clip_shorter_than_buckets_repeats_frames(self):
+        peaks = self.peaks([16384, -16384])
+        np.testing.assert_array_equal(peaks[:, 0], peaks[:, 1])
+        self.assertEqual(peaks[0, 0], 64)
+        self.assertEqual(peaks[-1, 0], -64)
+
+    def test_silence(self):
+        self.assertEqual(compute_peaks(np.zeros(0, np.int16), 1, 32768.0, 4), bytes(8))
+
+
+class SlowStorage(FileSystemStorage):
+    """Local stand-in for S3: every save takes ``delay`` seconds."""
+
+    def __init__(self, location, delay=0.0, failures=0, failing_names=()):
+        super().__init__(location=location)
+        self.delay = delay
+        self.failures = failures
+        self.failing_names = failing_names
+        # Uploads run in parallel threads
+        self.failures_lock = threading.Lock()
+
+    def _save(self, name, content):
+        if name in self.failing_names:
+            raise ConnectionError("connection refused")
+        time.sleep(self.delay)
+        with self.failures_lock:
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        if fail:
+            raise ConnectionError("connection reset")
+        return super()._save(name, content)
+
+
+class UploadFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source_dir.cleanup)
+        self.addCleanup(self.storage_dir.cleanup)
+        self.uploads = []
+        for i in range(6):
+            path = os.path.join(self.source_dir.name, f"segment_{i}.mp3")
+            with open(path, "wb") as source:
+                source.write(bytes([i]) * 1024)
+            self.uploads.append((f"audio_segments/song/segment_{i}.mp3", path))
+
+    async def test_uploads_run_concurrently(self):
+        storage = SlowStorage(self.storage_dir.name, delay=0.2)
+        started = time.monotonic()
+        keys = await upload_files(storage, self.uploads, concurrency=6)
+        elapsed = time.monotonic() - started
+
+        # Close to one upload's time, far from the 1.2s of uploading in turn
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(keys, [name for name, _ in self.uploads])
+        for i, key in enumerate(keys):
+            with storage.open(key, "rb") as stored:
+                self.assertEqual(stored.read(), bytes([i]) * 1024)
+
+    async def test_failed_upload_is_retried(self):
+        storage = SlowStorage(self.storage_dir.name, failures=2)
+        progress = []
+
+        async def on_progress(done, total):
+            progress.append((done, total))
+
+        with mock.patch("audojifactory.pipeline.UPLOAD_RETRY_DELAY", 0):
+            keys = await upload_files(
+                storage, self.uploads, concurrency=2, on_progress=on_progress
+            )
+        self.assertEqual(len(keys), len(self.uploads))
+        self.assertEqual(progress[-1], (6, 6))
+
+    async def test_gives_up_after_the_last_attempt(self):
+        storage = SlowStorage(self.storage_dir.name, failures=100)
+        with mock.patch("audojifactory.pipeline.UPLOAD_RETRY_DELAY", 0):
+            with self.assertRaises(ConnectionError):
+                await upload_files(storage, self.uploads[:1], concurrency=1)
+
+    async def test_failure_cancels_and_removes_the_other_uploads(self):
+        storage = SlowStorage(
+            self.storage_dir.name, delay=0.2, failing_names={self.uploads[0][0]}
+        )
+        with mock.patch("audojifactory.pipeline.UPLOAD_RETRY_DELAY", 0):
+            with self.assertRaises(ConnectionError):
+                await upload_files(storage, self.uploads, concurrency=3)
+
+        # Saves still running in threads when the failure hit were waited for
+        # and deleted, and no further upload started
+        await asyncio.sleep(0.3)
+        stored = [
+            name for _, _, names in os.walk(self.storage_dir.name) for name in names
+        ]
+        self.assertEqual(stored, [])
+
+
+class DeleteRenditionsTests(TestCase):
+    def setUp(self):
+        media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        media = override_settings(MEDIA_ROOT=media_dir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        audio_file = AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Song", audio_file="song.mp3"
+        )
+        self.segment = AudioSegment.objects.create(
+            audio_file=audio_file,
+            start_time=0.0,
+            end_time=2.0,
+            segment_file="audio_segments/song/segment_1.mp3",
+        )
+        self.other_segment = AudioSegment.objects.create(
+            audio_file=audio_file,
+            start_time=2.0,
+            end_time=4.0,
+            segment_file="audio_segments/song/segment_2.mp3",
+        )
+
+    def add_rendition(self, segment, profile):
+        rendition = SegmentRendition(segment=segment, profile=profile, size=4)
+        rendition.file.save(f"segment_{segment.id}.{profile}", ContentFile(b"data"))
+        return rendition
+
+    def test_drops_the_segments_renditions_and_files(self):
+        renditions = [
+            self.add_rendition(self.segment, profile)
+            for profile in ("opus-32k", "aac-64k")
+        ]
+        kept = self.add_rendition(self.other_segment, "opus-32k")
+
+        delete_renditions(self.segment)
+
+        self.assertQuerysetEqual(SegmentRendition.objects.all(), [kept])
+        for rendition in renditions:
+            self.assertFalse(rendition.file.storage.exists(rendition.file.name))
+        self.assertTrue(kept.file.storage.exists(kept.file.name))
+
+
+class AudojiChangesTests(TestCase):
+    def setUp(self):
+        self.audio_file = AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Song", audio_file="song.mp3"
+        )
+
+    def get_changes(self, cursor=0):
+        response = self.client.get(
+            "/api/audojifactory/audoji-changes/",
+            {"user_id": "user-1", "cursor": cursor},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_recent_changes_are_held_back(self):
+        body = self.get_changes()
+        self.assertEqual(body["cursor"], 0)
+        self.assertEqual(body["audio_files"], [])
+
+    def test_settled_changes_are_served_up_to_the_first_recent_one(self):
+        settled = SyncChange.objects.get(object_id=self.audio_file.id)
+        SyncChange.objects.filter(id=settled.id).update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+        AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Later", audio_file="later.mp3"
+        )
+
+        body = self.get_changes()
+        self.assertEqual(body["cursor"], settled.id)
+        self.assertEqual(
+            [audio_file["id"] for audio_file in body["audio_files"]],
+            [self.audio_file.id],
+        )
+
+
+class DeletedChangeTests(TestCase):
+    def test_cascaded_segments_take_the_owner_from_their_file(self):
+        audio_file = AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Song", audio_file="song.mp3"
+        )
+        for start in range(3):
+            AudioSegment.objects.create(
+                audio_file=audio_file, start_time=start, end_time=start + 1
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            audio_file.delete()
+
+        file_lookups = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "audojifactory_audiofile"' in query["sql"]
+        ]
+        self.assertEqual(file_lookups, [])
+        self.assertEqual(
+            sorted(
+                SyncChange.objects.filter(deleted=True).values_list("kind", "owner")
+            ),
+            [("audio_file", "user-1")] + [("audio_segment", "user-1")] * 3,
+        )
+
+
+class SegmentBatchFramesTests(SimpleTestCase):
+    segments = [{"id": 1, "transcription": "hello"}, {"id": 2, "transcription": "bye"}]
+
+    def test_channel_message_carries_one_encoding(self):
+        message = encode_segment_batch(self.segments, "1718000000000-0")
+        self.assertEqual(set(message), {"offset", "batch_msgpack"})
+
+    def test_json_batch_frame(self):
+        message = encode_segment_batch(self.segments, "1718000000000-0")
+        (frame,) = segment_batch_frames(message["batch_msgpack"], "json-batch")
+        self.assertEqual(
+            orjson.loads(frame),
+            {"offset": "1718000000000-0", "segments": self.segments},
+        )
+
+    def test_json_frame_per_segment(self):
+        message = encode_segment_batch(self.segments, "1718000000000-0")
+        frames = [
+            orjson.loads(frame)
+            for frame in segment_batch_frames(message["batch_msgpack"], "json")
+        ]
+        self.assertEqual([frame["id"] for frame in frames], [1, 2])
+        # Only the last frame of the batch carries the replay offset
+        self.assertNotIn("offset", frames[0])
+        self.assertEqual(frames[1]["offset"], "1718000000000-0")
+
+
+@override_settings(
+    PIPELINE_MAX_RUNNING_JOBS=10,
+    PIPELINE_MAX_RUNNING_JOBS_PER_USER=10,
+    PIPELINE_JOB_LEASE=60,
+)
+class SchedulingTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        patcher = mock.patch(
+            "audojifactory.scheduling.get_redis", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def enqueue(self, owner, *job_ids, priority=scheduling.DEFAULT):
+        for job_id in job_ids:
+            await scheduling.enqueue_job(
+                {"job_id": job_id, "owner": owner, "priority": priority}
+            )
+
+    async def admitted_ids(self):
+        return [job["job_id"] for job in await scheduling.admit_jobs()]
+
+    async def test_owners_take_turns(self):
+        await self.enqueue("alice", "a1", "a2", "a3")
+        await self.enqueue("bob", "b1")
+        self.assertEqual(await self.admitted_ids(), ["a1", "b1", "a2", "a3"])
+
+    async def test_higher_priority_classes_go_first(self):
+        await self.enqueue("alice", "bulk", priority=scheduling.BULK)
+        await self.enqueue("bob", "default")
+        await self.enqueue("carol", "interactive", priority=scheduling.INTERACTIVE)
+        self.assertEqual(await self.admitted_ids(), ["interactive", "default", "bulk"])
+
+    @override_settings(PIPELINE_MAX_RUNNING_JOBS_PER_USER=1)
+    async def test_owner_cap_holds_jobs_until_a_release(self):
+        await self.enqueue("alice", "a1", "a2")
+        await self.enqueue("bob", "b1")
+        self.assertEqual(await self.admitted_ids(), ["a1", "b1"])
+        self.assertEqual(await self.admitted_ids(), [])
+
+        await scheduling.release_job({"job_id": "a1", "owner": "alice"})
+        self.assertEqual(await self.admitted_ids(), ["a2"])
+
+    @override_settings(PIPELINE_MAX_RUNNING_JOBS=2)
+    async def test_global_cap(self):
+        await self.enqueue("alice", "a1")
+        await self.enqueue("bob", "b1")
+        await self.enqueue("carol", "c1")
+        self.assertEqual(await self.admitted_ids(), ["a1", "b1"])
+
+        await scheduling.release_job({"job_id": "b1", "owner": "bob"})
+        self.assertEqual(await self.admitted_ids(), ["c1"])
+
+    @override_settings(PIPELINE_MAX_RUNNING_JOBS=1)
+    async def test_expired_lease_frees_its_slot(self):
+        await self.enqueue("alice", "a1")
+        await self.enqueue("bob", "b1")
+        with mock.patch("audojifactory.scheduling.time") as clock:
+            clock.time.return_value = 1000.0
+            self.assertEqual(await self.admitted_ids(), ["a1"])
+
+            # Renewed leases keep the slot; a crashed job's lease runs out
+            clock.time.return_value = 1050.0
+            await scheduling.renew_job_lease({"job_id": "a1", "owner": "alice"})
+            clock.time.return_value = 1100.0
+            self.assertEqual(await self.admitted_ids(), [])
+            clock.time.return_value = 1111.0
+            self.assertEqual(await self.admitted_ids(), ["b1"])
+
+
+class SelectionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeAsyncRedis(server=self.server)
+        patcher = mock.patch(
+            "audojifactory.selection_cache.get_redis", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.selected = {1, 2}
+        self.loads = 0
+
+    async def load(self, user_id):
+        self.loads += 1
+        return set(self.selected)
+
+    def patch_load(self, load):
+        return mock.patch(
+            "audojifactory.selection_cache.load_selected_segment_ids", load
+        )
+
+    async def test_miss_warms_the_set(self):
+        with self.patch_load(self.load):
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), {1, 2})
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), {1, 2})
+        self.assertEqual(self.loads, 1)
+
+    async def test_empty_selection_is_cached(self):
+        self.selected = set()
+        with self.patch_load(self.load):
+            await selection_cache.get_selected_segment_ids(7)
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), set())
+        self.assertEqual(self.loads, 1)
+
+    async def test_updates_patch_a_warm_set(self):
+        with self.patch_load(self.load):
+            await selection_cache.get_selected_segment_ids(7)
+            await selection_cache.update_selected_segments(7, added=[3], removed=[1])
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), {2, 3})
+        self.assertEqual(self.loads, 1)
+
+    async def test_updates_leave_a_cold_set_cold(self):
+        await selection_cache.update_selected_segments(7, added=[3])
+        self.assertFalse(await self.redis.exists(selection_cache.selection_key(7)))
+
+    async def test_warm_racing_a_write_is_discarded(self):
+        async def load_then_race(user_id):
+            # The load reads the selection, then a write commits and updates
+            # the (still cold) cache before the load stores what it read
+            selected = await self.load(user_id)
+            self.selected.add(3)
+            await selection_cache.update_selected_segments(user_id, added=[3])
+            return selected
+
+        with self.patch_load(load_then_race):
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), {1, 2})
+        self.assertFalse(await self.redis.exists(selection_cache.selection_key(7)))
+
+        with self.patch_load(self.load):
+            self.assertEqual(
+                await selection_cache.get_selected_segment_ids(7), {1, 2, 3}
+            )
+
+    async def test_redis_errors_fall_back_to_the_database(self):
+        self.server.connected = False
+        with self.patch_load(self.load):
+            self.assertEqual(await selection_cache.get_selected_segment_ids(7), {1, 2})
+            await selection_cache.update_selected_segments(7, added=[3])
+        self.assertEqual(self.loads, 1)
+
+
+class BulkSelectTests(TestCase):
+    def setUp(self):
+        audio_file = AudioFile.objects.create(
+            owner="user-1", artiste="Artiste", title="Song", audio_file="song.mp3"
+        )
+        self.segments = [
+            AudioSegment.objects.create(
+                audio_file=audio_file,
+                start_time=float(n),
+                end_time=float(n + 1),
+                segment_file=f"audio_segments/song/segment_{n}.mp3",
+            )
+            for n in range(3)
+        ]
+        for target in ("update_selected_segments", "prepare_popular_renditions"):
+            patcher = mock.patch(f"audojifactory.views.{target}", mock.AsyncMock())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **data):
+        return self.client.post(
+            "/api/audojifactory/select-audojis/bulk/",
+            {"user_id": "user-2", **data},
+            content_type="application/json",
+        )
+
+    def selection_changes(self):
+        changes = SyncChange.objects.filter(kind=SyncChange.SELECTION, owner="user-2")
+        return sorted(changes.values_list("object_id", flat=True))
+
+    def test_rejects_ids_that_are_not_a_list_of_ints(self):
+        for select in ("1,2", [1, "2"], [1.5], [True]):
+            with self.subTest(select=select):
+                self.assertEqual(self.post(select=select).status_code, 400)
+
+    def test_reports_a_status_for_every_requested_id(self):
+        first, second, third = (segment.id for segment in self.segments)
+        UserSelectedAudoji.objects.create(user_id="user-2", audio_segment_id=third)
+
+        response = self.post(select=[first, first, 999], deselect=[third])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"audio_segment_id": first, "status": "selected"},
+                {"audio_segment_id": 999, "status": "not_found"},
+                {"audio_segment_id": third, "status": "deselected"},
+            ],
+        )
+        self.assertEqual(
+            list(
+                UserSelectedAudoji.objects.filter(user_id="user-2").values_list(
+                    "audio_segment_id", flat=True
+                )
+            ),
+            [first],
+        )
+
+    def test_already_selected_segments_are_not_recorded_again(self):
+        first, second, _ = (segment.id for segment in self.segments)
+        self.post(select=[first])
+        self.assertEqual(self.selection_changes(), [first])
+
+        response = self.post(select=[first, second])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.selection_changes(), [first, second])
+        self.assertEqual(UserSelectedAudoji.objects.filter(user_id="user-2").count(), 2)
@@ -0,0 +1,207 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from audojiengine.logging_config import configure_logger
+from audojiengine.openai_client import openai_governor
+
+logger = configure_logger(__name__)
+
+# model_type (the upload's ?model_type=) -> backend instance
+TRANSCRIPTION_BACKENDS = {}
+
+
+def register_backend(*model_types):
+    def decorator(backend_class):
+        backend = backend_class()
+        for model_type in model_types:
+            TRANSCRIPTION_BACKENDS[model_type] = backend
+        return backend_class
+
+    return decorator
+
+
+def get_transcription_backend(model_type):
+    """Return the backend for a model_type, or the default for unknown types."""
+    backend = TRANSCRIPTION_BACKENDS.get(model_type)
+    if backend is None:
+        backend = TRANSCRIPTION_BACKENDS[settings.DEFAULT_TRANSCRIPTION_BACKEND]
+    return backend
+
+
+def normalize_transcript(segments, words=()):
+    """Reduce any transcription output to plain segment and word dicts."""
+    return {
+        "segments": [
+            {
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": segment.get("text", "").strip(),
+            }
+            for segment in segments
+        ],
+        # probability is None for engines that don't report word confidence
+        "words": [
+            {
+                "start": word["start"],
+                "end": word["end"],
+                "word": word["word"],
+                "probability": word.get("probability"),
+            }
+            for word in words
+        ],
+    }
+
+
+def read_file(path):
+    with open(path, "rb") as source:
+        return source.read()
+
+
+class TranscriptionBackend(ABC):
+    """
+    Turns an audio file into a normalized transcript (see normalize_transcript).
+
+    ``cache_settings`` lists everything besides the audio that changes the
+    output, for the transcript cache key.
+    """
+
+    name = None
+
+    @abstractmethod
+    def cache_settings(self):
+        ...
+
+    @abstractmethod
+    async def transcribe(self, path):
+        ...
+
+
+class LocalModelBackend(TranscriptionBackend):
+    """
+    Loads its model once per worker process, on first use. The blocking
+    ``transcribe_file`` runs off the event loop.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.model_lock = threading.Lock()
+
+    @abstractmethod
+    def load_model(self):
+        ...
+
+    @abstractmethod
+    def transcribe_file(self, path):
+        ...
+
+    def get_model(self):
+        with self.model_lock:
+            if self.model is None:
+                logger.info(f"Loading {self.name} model")
+                self.model = self.load_model()
+            return self.model
+
+    async def transcribe(self, path):
+        return await sync_to_async(self.transcribe_file, thread_sensitive=False)(path)
+
+
+@register_backend("api")
+class OpenAIAPIBackend(TranscriptionBackend):
+    name = "openai-api"
+
+    def cache_settings(self):
+        return {
+            "engine": self.name,
+            "model": "whisper-1",
+            "timestamp_granularities": ["word", "segment"],
+        }
+
+    async def transcribe(self, path):
+        audio_content = await sync_to_async(read_file, thread_sensitive=False)(path)
+        transcript = await openai_governor.create_transcription(
+            file=(os.path.basename(path), audio_content),
+            model="whisper-1",
+            response_format="verbose_json",
+            timestamp_granularities=["word", "segment"],
+        )
+        return normalize_transcript(
+            transcript.segments, getattr(transcript, "words", None) or ()
+        )
+
+
+@register_backend("os")
+class WhisperBackend(LocalModelBackend):
+    name = "openai-whisper"
+
+    def cache_settings(self):
+        return {
+            "engine": self.name,
+            "model": settings.MODEL_SIZE,
+            "word_timestamps": True,
+        }
+
+    def load_model(self):
+        import whisper
+
+        return whisper.load_model(settings.MODEL_SIZE)
+
+    def transcribe_file(self, path):
+        result = self.get_model().transcribe(path, word_timestamps=True)
+        words = [word for segment in result["segments"] for word in segment["words"]]
+        return normalize_transcript(result["segments"], words)
+
+
+@register_backend("fast")
+class FasterWhisperBackend(LocalModelBackend):
+    """
+    CTranslate2 Whisper with int8 weights, for CPU-only workers. Same model
+    sizes as openai-whisper at a fraction of the CPU time and memory.
+    """
+
+    name = "faster-whisper"
+    compute_type = "int8"
+    beam_size = 5
+
+    def cache_settings(self):
+        return {
+            "engine": self.name,
+            "model": settings.MODEL_SIZE,
+            "compute_type": self.compute_type,
+            "beam_size": self.beam_size,
+            "word_timestamps": True,
+        }
+
+    def load_model(self):
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(
+            settings.MODEL_SIZE,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=settings.FASTER_WHISPER_CPU_THREADS,
+        )
+
+    def transcribe_file(self, path):
+        segments, _ = self.get_model().transcribe(
+            path, beam_size=self.beam_size, word_timestamps=True
+        )
+        segment_dicts, word_dicts = [], []
+        # Segments are decoded lazily as this generator is consumed
+        for segment in segments:
+            segment_dicts.append(
+                {"start": segment.start, "end": segment.end, "text": segment.text}
+            )
+            word_dicts.extend(
+                {
+                    "start": word.start,
+                    "end": word.end,
+                    "word": word.word,
+                    "probability": word.probability,
+                }
+                for word in segment.words or ()
+            )
+        return normalize_transcript(segment_dicts, word_dicts)
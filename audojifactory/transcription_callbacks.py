@@ -0,0 +1,68 @@
+import gzip
+import os
+import uuid
+
+import ijson
+
+from audojifactory.pipeline import scratch_storage
+
+CHUNK_SIZE = 1024 * 1024
+# Upper bound on a decompressed callback body, so a small gzip can't fill the disk
+MAX_CALLBACK_BYTES = 512 * 1024 * 1024
+
+
+class CallbackTooLarge(ValueError):
+    pass
+
+
+def spill_callback(stream, content_encoding=None):
+    """
+    Copy a transcription callback body to scratch in fixed-size chunks and return
+    its scratch reference. Gzip bodies (Content-Encoding: gzip) are decompressed
+    on the way, so the body is never held in memory whole.
+    """
+    if content_encoding == "gzip":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+
+    ref = f"callbacks/{uuid.uuid4().hex}.json"
+    path = scratch_storage.path(ref)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+    try:
+        with open(path, "wb") as callback_file:
+            while chunk := stream.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_CALLBACK_BYTES:
+                    raise CallbackTooLarge(
+                        f"Callback body exceeds {MAX_CALLBACK_BYTES} bytes"
+                    )
+                callback_file.write(chunk)
+    except Exception:
+        scratch_storage.delete(ref)
+        raise
+    return ref
+
+
+def read_callback_fields(ref, names=("audio_file_url", "group_name")):
+    """Stream the stored callback until the named top-level fields are found."""
+    fields = {}
+    with scratch_storage.open(ref, "rb") as callback_file:
+        for prefix, event, value in ijson.parse(callback_file):
+            if prefix in names and event in ("string", "number", "null"):
+                fields[prefix] = value
+                if len(fields) == len(names):
+                    break
+
+    missing = [name for name in names if name not in fields]
+    if missing:
+        raise KeyError(", ".join(missing))
+    return fields
+
+
+def iter_callback_segments(ref):
+    """Yield the callback's transcription segments one at a time."""
+    with scratch_storage.open(ref, "rb") as callback_file:
+        yield from ijson.items(
+            callback_file, "transcription_result.segments.item", use_float=True
+        )
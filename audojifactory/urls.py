@@ -5,12 +5,24 @@ from audojifactory import views
 urlpatterns = [
     path("audiofiles/", views.AudioFileList.as_view(), name="audiofile_list"),
     path("audiosegments/", views.AudioSegmentList.as_view(), name="audiosegment_list"),
+    path(
+        "audiosegments/<int:pk>/rendition/",
+        views.SegmentRenditionView.as_view(),
+        name="audiosegment_rendition",
+    ),
     # path("search-audoji/", views.SearchAudoji.as_view(), name="search_audoji"),
     path("get-audoji/", views.GetAudoji.as_view(), name="get_audoji"),
     path("select-audoji/", views.SelectAudoji.as_view(), name="select-audoji"),
+    path(
+        "select-audojis/bulk/",
+        views.BulkSelectAudoji.as_view(),
+        name="bulk-select-audojis",
+    ),
     path(
         "selected-audojis/", views.SelectedAudojiList.as_view(), name="selected-audojis"
     ),
+    path("media-cookies/", views.MediaCookies.as_view(), name="media_cookies"),
+    path("audoji-changes/", views.AudojiChanges.as_view(), name="audoji-changes"),
     path(
         "audoji-transcription-result/",
         views.AWSTranscription.as_view(),
@@ -1,54 +1,65 @@
-import asyncio
 import json
 import time
-from threading import Thread
+from datetime import timedelta
 
-from django.http import HttpResponseBadRequest
-from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseBadRequest, HttpResponseRedirect
 from django.urls import reverse
 from django.utils import timezone
-from rest_framework import generics, status
+from rest_framework import status
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from audojiengine.background import side_writes
 from audojiengine.logging_config import configure_logger
 from audojiengine.mg_database import store_data_to_audio_mgdb
 from audojifactory.audojifactories.opensourcefactory import AudioRetrieval
-from audojifactory.audojifactories.opensourcefactory import (
-    AudioRetrieval as OSAudioRetrieval,
+from audojifactory.changes import collapse_changes, record_selection_changes
+from audojifactory.models import (
+    AudioFile,
+    AudioSegment,
+    SyncChange,
+    UserSelectedAudoji,
+)
+from audojifactory.pipeline import scratch_storage
+from audojifactory.renditions import (
+    ORIGINAL_RENDITION,
+    find_newly_popular,
+    get_or_create_rendition,
+    resolve_rendition,
+)
+from audojifactory.scheduling import BULK, DEFAULT
+from audojifactory.selection_cache import (
+    get_selected_segment_ids,
+    update_selected_segments,
 )
-from audojifactory.models import AudioFile, AudioSegment, UserSelectedAudoji
 from audojifactory.serializers import AudioFileSerializer, AudioSegmentSerializer
 from audojifactory.tasks import (
+    schedule_audio_pipeline,
     task_run_async_complete_processing,
     task_run_async_db_operation,
-    task_run_async_processor,
+    task_evict_renditions,
+    task_prepare_renditions,
     task_run_async_processor_AWS,
 )
+from audojifactory.transcription_callbacks import (
+    read_callback_fields,
+    spill_callback,
+)
 from audojifactory.utils import minutes_to_seconds, seconds_to_minutes
+from helpers.pagination import AsyncPageNumberPagination
+from helpers.views import AsyncAPIView
 
 logger = configure_logger(__name__)
 
 
-def run_async_processor(processor):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(processor.run_and_save_segments())
-    loop.close()
-
-
-def run_async_db_operation(data):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(store_data_to_audio_mgdb(data))
-    loop.close()
-
-
-class AudioFileList(APIView):
+class AudioFileList(AsyncAPIView):
     parser_classes = (MultiPartParser, FormParser)
 
-    def get(self, request):
+    async def get(self, request):
         # Start with all audio files
         queryset = AudioFile.objects.all().order_by("-upload_date")
 
@@ -64,10 +75,12 @@ class AudioFileList(APIView):
                 title__icontains=title
             )  # Case-insensitive containment search
 
-        serializer = AudioFileSerializer(queryset, many=True)
+        serializer = AudioFileSerializer(
+            [obj async for obj in queryset], many=True, context={"request": request}
+        )
         return Response(serializer.data)
 
-    def post(self, request):
+    async def post(self, request):
         process_start_time = time.time()
         responses = []
 
@@ -96,10 +109,16 @@ class AudioFileList(APIView):
 
                 serializer = AudioFileSerializer(data=data)
                 if serializer.is_valid():
-                    audio_file_instance = serializer.save()
+                    # Model insert plus storage upload
+                    audio_file_instance = await sync_to_async(serializer.save)()
                     data["audio_file"] = audio_file_instance.audio_file.url
-                    db_thread = Thread(target=run_async_db_operation, args=(data,))
-                    db_thread.start()
+                    data["cover_image"] = (
+                        audio_file_instance.cover_image.url
+                        if audio_file_instance.cover_image
+                        else None
+                    )
+                    # Waits only while the side-write queue is full
+                    await side_writes.submit(store_data_to_audio_mgdb, data)
 
                     # Set a default of os
                     model_type = request.query_params.get("model_type", "")
@@ -114,8 +133,13 @@ class AudioFileList(APIView):
 
                     # Call the Celery task for processing and create a unique group name per user
                     group_name = f"user_{owner_id}"
-                    task_run_async_processor.delay(
-                        audio_file_instance.id, model_type, group_name
+                    # Multi-file uploads queue behind single uploads of other users
+                    await schedule_audio_pipeline(
+                        audio_file_instance.id,
+                        model_type,
+                        group_name,
+                        owner_id,
+                        priority=BULK if num_files > 1 else DEFAULT,
                     )
 
                     duration = time.time() - process_start_time
@@ -138,17 +162,37 @@ class AudioFileList(APIView):
         return Response(responses, status=status.HTTP_201_CREATED)
 
 
+def callback_body(request):
+    """
+    The raw callback body as a file. DRF's request.stream is None without a
+    Content-Length, so chunked callbacks are read from the Django request
+    (the ASGI handler has already spooled the whole body). Under WSGI Django
+    caps the body at Content-Length, so a chunked body comes from the
+    server's de-chunked input instead.
+    """
+    django_request = request._request
+    wsgi_input = django_request.META.get("wsgi.input")
+    if wsgi_input is not None and not django_request.META.get("CONTENT_LENGTH"):
+        return wsgi_input
+    return django_request
+
+
 class AWSTranscription(APIView):
     def post(self, request):
         process_start_time = time.time()
         try:
-            data = json.loads(request.body)
-            audio_file_url = data["audio_file_url"]
-            group_name = data["group_name"]
-            transcription_result = data["transcription_result"]
+            # Only a scratch reference goes through the broker, not the transcript
+            transcription_ref = spill_callback(
+                callback_body(request), request.headers.get("Content-Encoding")
+            )
+            try:
+                fields = read_callback_fields(transcription_ref)
+            except Exception:
+                scratch_storage.delete(transcription_ref)
+                raise
 
             task_run_async_complete_processing.delay(
-                audio_file_url, transcription_result, group_name
+                fields["audio_file_url"], transcription_ref, fields["group_name"]
             )
 
             duration = time.time() - process_start_time
@@ -159,7 +203,7 @@ class AWSTranscription(APIView):
             return HttpResponseBadRequest(json.dumps({"error": str(e)}))
 
 
-class AudioSegmentList(APIView):
+class AudioSegmentList(AsyncAPIView):
     """
     GET: Retrieve a list of all audio segments.
 
@@ -185,7 +229,7 @@ class AudioSegmentList(APIView):
     This endpoint does not require any query parameters and returns a list of all segments in JSON format.
     """
 
-    def get(self, request):
+    async def get(self, request):
         # Filter AudioFiles by user_id and optionally by title
         user_id = request.query_params.get("user_id")
         title = request.query_params.get("title")
@@ -197,7 +241,9 @@ class AudioSegmentList(APIView):
             audio_files_query = audio_files_query.filter(title__icontains=title)
 
         # Now, filter AudioSegments based on AudioFiles filtered above
-        segments_query = AudioSegment.objects.filter(audio_file__in=audio_files_query)
+        segments_query = AudioSegment.objects.select_related("audio_file").filter(
+            audio_file__in=audio_files_query
+        )
 
         # Optionally, add more filters for segments based on additional query params
         # For example, filtering by transcription or category
@@ -211,12 +257,91 @@ class AudioSegmentList(APIView):
         if category:
             segments_query = segments_query.filter(category__name__icontains=category)
 
-        serializer = AudioSegmentSerializer(segments_query, many=True)
+        serializer = AudioSegmentSerializer(
+            [obj async for obj in segments_query],
+            many=True,
+            context={
+                "request": request,
+                "selected_segment_ids": await get_selected_segment_ids(user_id),
+            },
+        )
         return Response(serializer.data)
 
 
-class SelectAudoji(APIView):
-    def post(self, request):
+class SegmentRenditionView(AsyncAPIView):
+    """
+    GET: Redirect to a segment's file in a rendition, transcoding it on first
+    request.
+
+    Query params: ``rendition`` (opus-32k, aac-64k, mp3-192k) or ``network``
+    (slow-2g, 2g, 3g, 4g, wifi). mp3-192k is the segment's original file.
+    """
+
+    async def get(self, request, pk):
+        profile = resolve_rendition(
+            request.query_params.get("rendition"),
+            request.query_params.get("network"),
+        )
+        if profile is None:
+            return Response(
+                {"error": "Unknown rendition or network class."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            segment = await AudioSegment.objects.select_related("audio_file").aget(
+                id=pk
+            )
+        except AudioSegment.DoesNotExist:
+            raise Http404
+        if not segment.segment_file:
+            raise Http404
+
+        if profile == ORIGINAL_RENDITION:
+            return HttpResponseRedirect(segment.segment_file.url)
+
+        rendition, created = await get_or_create_rendition(segment, profile)
+        if created:
+            await sync_to_async(task_evict_renditions.delay)()
+        return HttpResponseRedirect(rendition.file.url)
+
+
+class MediaCookies(AsyncAPIView):
+    """
+    GET: Set the CloudFront signed cookies that grant access to media files,
+    when MEDIA_SIGNED_COOKIES is on. Clients call it before playing media and
+    again before ``expires`` (a UTC timestamp).
+    """
+
+    async def get(self, request):
+        if not getattr(default_storage, "signed_cookies_enabled", False):
+            raise Http404
+
+        cookies, expires_at = default_storage.signed_cookies(
+            settings.MEDIA_COOKIE_LIFETIME
+        )
+        response = Response({"expires": expires_at.timestamp()})
+        for name, value in cookies.items():
+            response.set_cookie(
+                name,
+                value,
+                max_age=settings.MEDIA_COOKIE_LIFETIME,
+                domain=settings.MEDIA_COOKIE_DOMAIN,
+                secure=True,
+                httponly=True,
+                samesite="None",
+            )
+        return response
+
+
+async def prepare_popular_renditions(segment_ids):
+    popular_ids = await find_newly_popular(segment_ids)
+    if popular_ids:
+        await sync_to_async(task_prepare_renditions.delay)(popular_ids)
+
+
+class SelectAudoji(AsyncAPIView):
+    async def post(self, request):
         user_id = request.data.get("user_id")
         audio_segment_id = request.data.get("audio_segment_id")
         action = request.data.get("action", "select")  # "select" or "deselect"
@@ -227,14 +352,19 @@ class SelectAudoji(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        audio_segment = get_object_or_404(AudioSegment, id=audio_segment_id)
+        try:
+            audio_segment = await AudioSegment.objects.aget(id=audio_segment_id)
+        except AudioSegment.DoesNotExist:
+            raise Http404
 
         if action == "select":
-            UserSelectedAudoji.objects.update_or_create(
+            await UserSelectedAudoji.objects.aupdate_or_create(
                 user_id=user_id,
                 audio_segment=audio_segment,
                 defaults={"selected_at": timezone.now()},
             )
+            await update_selected_segments(user_id, added=[audio_segment.id])
+            await prepare_popular_renditions([audio_segment.id])
             # segment_data = {
             #     "user_id": user_id,
             #     "transcription": audio_segment.transcription,
@@ -245,9 +375,10 @@ class SelectAudoji(APIView):
             message = "Audoji selected successfully."
 
         elif action == "deselect":
-            UserSelectedAudoji.objects.filter(
+            await UserSelectedAudoji.objects.filter(
                 user_id=user_id, audio_segment=audio_segment
-            ).delete()
+            ).adelete()
+            await update_selected_segments(user_id, removed=[audio_segment.id])
             message = "Audoji deselected successfully."
         else:
             return Response(
@@ -258,19 +389,124 @@ class SelectAudoji(APIView):
         return Response({"message": message}, status=status.HTTP_200_OK)
 
 
-class SelectedAudojiList(generics.ListAPIView):
-    serializer_class = AudioSegmentSerializer
+def parse_segment_ids(value):
+    """A request's list of segment IDs; anything but a list of ints is rejected."""
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(
+        isinstance(i, int) and not isinstance(i, bool) for i in value
+    ):
+        raise ValueError("Expected a list of audio segment IDs")
+    return value
+
+
+class BulkSelectAudoji(AsyncAPIView):
+    """
+    POST: Select and/or deselect many audio segments for a user in one request.
+
+    Input:
+    {
+        "user_id": str,
+        "select": [int, ...],     // Optional: audio segment IDs to select
+        "deselect": [int, ...]    // Optional: audio segment IDs to deselect
+    }
+
+    Returns the outcome for every requested ID:
+    {
+        "results": [
+            {"audio_segment_id": int, "status": "selected" | "deselected" | "not_found"},
+            ...
+        ]
+    }
+    """
+
+    async def post(self, request):
+        user_id = request.data.get("user_id")
+
+        try:
+            select_ids = parse_segment_ids(request.data.get("select"))
+            deselect_ids = parse_segment_ids(request.data.get("deselect"))
+        except ValueError:
+            return Response(
+                {"error": "select and deselect must be lists of audio segment IDs."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not user_id or not (select_ids or deselect_ids):
+            return Response(
+                {"error": "Missing user_id or audio segment IDs."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-    def get_queryset(self):
+        if set(select_ids) & set(deselect_ids):
+            return Response(
+                {"error": "An audio segment cannot be both selected and deselected."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        existing_ids = {
+            segment_id
+            async for segment_id in AudioSegment.objects.filter(
+                id__in=select_ids + deselect_ids
+            ).values_list("id", flat=True)
+        }
+        to_select = [i for i in dict.fromkeys(select_ids) if i in existing_ids]
+        to_deselect = [i for i in dict.fromkeys(deselect_ids) if i in existing_ids]
+
+        if to_select:
+            # ignore_conflicts does not say which rows it skipped, so only the
+            # segments not selected beforehand are recorded as new selections
+            already_selected = {
+                segment_id
+                async for segment_id in UserSelectedAudoji.objects.filter(
+                    user_id=user_id, audio_segment_id__in=to_select
+                ).values_list("audio_segment_id", flat=True)
+            }
+            newly_selected = [i for i in to_select if i not in already_selected]
+            await UserSelectedAudoji.objects.abulk_create(
+                [
+                    UserSelectedAudoji(user_id=user_id, audio_segment_id=segment_id)
+                    for segment_id in newly_selected
+                ],
+                ignore_conflicts=True,
+            )
+            await sync_to_async(record_selection_changes)(user_id, newly_selected)
+            await prepare_popular_renditions(newly_selected)
+        if to_deselect:
+            await UserSelectedAudoji.objects.filter(
+                user_id=user_id, audio_segment_id__in=to_deselect
+            ).adelete()
+
+        await update_selected_segments(user_id, added=to_select, removed=to_deselect)
+
+        results = [
+            {
+                "audio_segment_id": segment_id,
+                "status": "selected" if segment_id in existing_ids else "not_found",
+            }
+            for segment_id in dict.fromkeys(select_ids)
+        ] + [
+            {
+                "audio_segment_id": segment_id,
+                "status": "deselected" if segment_id in existing_ids else "not_found",
+            }
+            for segment_id in dict.fromkeys(deselect_ids)
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class SelectedAudojiList(AsyncAPIView):
+    pagination_class = AsyncPageNumberPagination
+
+    def get_queryset(self, selected_segments):
         user_id = self.request.query_params.get("user_id")
 
         if not user_id:
             return AudioSegment.objects.none()  # Return an empty queryset if no user_id
 
-        selected_segments = UserSelectedAudoji.objects.filter(
-            user_id=user_id
-        ).values_list("audio_segment", flat=True)
-        queryset = AudioSegment.objects.filter(id__in=selected_segments)
+        queryset = AudioSegment.objects.select_related("audio_file").filter(
+            id__in=selected_segments
+        )
 
         # Implement additional filtering if needed
         title = self.request.query_params.get("title")
@@ -279,8 +515,139 @@ class SelectedAudojiList(generics.ListAPIView):
 
         return queryset
 
+    async def get(self, request):
+        selected_segments = await get_selected_segment_ids(
+            request.query_params.get("user_id")
+        )
+        queryset = self.get_queryset(selected_segments)
+
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request, self)
+
+        serializer = AudioSegmentSerializer(
+            page,
+            many=True,
+            context={"request": request, "selected_segment_ids": selected_segments},
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AudojiChanges(AsyncAPIView):
+    """
+    GET: Retrieve everything that changed for a user since a sync cursor.
+
+    Query params:
+    - user_id: str (mandatory)
+    - cursor: int, the "cursor" returned by the previous call (0 for a full sync)
+    - limit: int, maximum number of changes to read (default 500, max 1000)
 
-class GetAudoji(APIView):
+    Changes are served once they are a few seconds old
+    (settings.SYNC_CHANGE_SETTLE_SECONDS), so none is skipped by the cursor.
+
+    Response Format:
+    {
+        "cursor": int,              // Pass back as ?cursor= on the next call
+        "has_more": bool,           // More changes are waiting past this cursor
+        "audio_files": [...],       // Changed audio files, as in audiofiles/
+        "audio_segments": [...],    // Changed segments, as in audiosegments/
+        "selected": [int, ...],     // Newly selected audio segment IDs
+        "deleted": {
+            "audio_files": [int, ...],
+            "audio_segments": [int, ...],
+            "selected": [int, ...]  // Deselected audio segment IDs
+        }
+    }
+    """
+
+    default_limit = 500
+    max_limit = 1000
+
+    async def get(self, request):
+        user_id = request.query_params.get("user_id")
+        if not user_id:
+            return Response(
+                {"error": "Missing user_id."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            cursor = int(request.query_params.get("cursor", 0))
+            limit = min(
+                int(request.query_params.get("limit", self.default_limit)),
+                self.max_limit,
+            )
+        except ValueError:
+            return Response(
+                {"error": "cursor and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        changes = [
+            change
+            async for change in SyncChange.objects.filter(
+                owner=user_id, id__gt=cursor
+            ).order_by("id")[: limit + 1]
+        ]
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        # Stop before the first change that may still have lower-id company in
+        # an uncommitted transaction; it is served once it has settled
+        settled_before = timezone.now() - timedelta(
+            seconds=settings.SYNC_CHANGE_SETTLE_SECONDS
+        )
+        for i, change in enumerate(changes):
+            if change.created_at > settled_before:
+                changes = changes[:i]
+                has_more = False
+                break
+        collapsed = collapse_changes(changes)
+
+        file_ids, deleted_file_ids = collapsed[SyncChange.AUDIO_FILE]
+        segment_ids, deleted_segment_ids = collapsed[SyncChange.AUDIO_SEGMENT]
+        selected_ids, deselected_ids = collapsed[SyncChange.SELECTION]
+
+        # Empty id__in lookups short-circuit without hitting the database
+        audio_files = [obj async for obj in AudioFile.objects.filter(id__in=file_ids)]
+        audio_segments = [
+            obj
+            async for obj in AudioSegment.objects.select_related("audio_file").filter(
+                id__in=segment_ids
+            )
+        ]
+        selected = [
+            segment_id
+            async for segment_id in UserSelectedAudoji.objects.filter(
+                user_id=user_id, audio_segment_id__in=selected_ids
+            ).values_list("audio_segment_id", flat=True)
+        ]
+
+        return Response(
+            {
+                "cursor": changes[-1].id if changes else cursor,
+                "has_more": has_more,
+                "audio_files": AudioFileSerializer(
+                    audio_files, many=True, context={"request": request}
+                ).data,
+                "audio_segments": AudioSegmentSerializer(
+                    audio_segments,
+                    many=True,
+                    context={
+                        "request": request,
+                        "selected_segment_ids": await get_selected_segment_ids(
+                            user_id
+                        ),
+                    },
+                ).data,
+                "selected": selected,
+                "deleted": {
+                    "audio_files": deleted_file_ids,
+                    "audio_segments": deleted_segment_ids,
+                    "selected": deselected_ids,
+                },
+            }
+        )
+
+
+class GetAudoji(AsyncAPIView):
     """
     POST: Retrieve a specific audio segment based on transcription and time range, or edit an existing segment.
 
@@ -330,20 +697,20 @@ class GetAudoji(APIView):
     }
     """
 
-    def post(self, request):
+    async def post(self, request):
         query_data = request.data
         operation = query_data.get("operation", "retrieve")
 
         if operation == "retrieve":
-            return self.handle_retrieve(query_data)
+            return await self.handle_retrieve(query_data)
         elif operation == "edit":
-            return self.handle_edit(query_data)
+            return await self.handle_edit(query_data)
         elif operation == "delete":
-            return self.handle_delete(query_data)
+            return await self.handle_delete(query_data)
         else:
             return Response({"error": "Invalid operation"}, status=400)
 
-    def handle_retrieve(self, query_data):
+    async def handle_retrieve(self, query_data):
         process_start_time = time.time()
         query = query_data.get("query")
         start_time_minutes = query_data.get("start_time_minutes")
@@ -354,7 +721,7 @@ class GetAudoji(APIView):
         end_time_seconds = minutes_to_seconds(end_time_minutes)
 
         # Check if a matching segment already exists
-        existing_segments = AudioSegment.objects.filter(
+        existing_segments = AudioSegment.objects.select_related("audio_file").filter(
             transcription=query,
             start_time__gte=start_time_seconds,
             start_time__lte=start_time_seconds,  # Consider a small margin for start_time if needed
@@ -362,20 +729,22 @@ class GetAudoji(APIView):
             end_time__lte=end_time_seconds,  # Consider a small margin for end_time if needed
         )
 
-        if existing_segments.exists():
-            segment_instance = existing_segments.first()
+        segment_instance = await existing_segments.afirst()
+        if segment_instance is not None:
             segment_info = self.format_segment_info(segment_instance)
         else:
             # If no existing segment, proceed to create a new one
             try:
-                segment_instance = AudioSegment.objects.get(
+                segment_instance = await AudioSegment.objects.select_related(
+                    "audio_file"
+                ).aget(
                     transcription=query,
                     start_time=start_time_seconds,
                     end_time=end_time_seconds,
                 )
-                segment_info = OSAudioRetrieval(
+                segment_info = await AudioRetrieval(
                     segment_instance, start_time_seconds, end_time_seconds
-                ).create_audoji()
+                ).acreate_audoji()
             except Exception as e:
                 logger.error(f"Error creating audio segment: {e}")
                 return Response({"error": "Error creating audio segment"}, status=400)
@@ -384,14 +753,16 @@ class GetAudoji(APIView):
         logger.info(f"AUDOJI CREATION DURATION: {duration:.2f} seconds")
         return Response(segment_info)
 
-    def handle_edit(self, query_data):
+    async def handle_edit(self, query_data):
         segment_id = query_data.get("id")
         new_transcription = query_data.get("transcription")
         start_time_minutes = query_data.get("start_time_minutes", None)
         end_time_minutes = query_data.get("end_time_minutes", None)
 
         try:
-            segment_instance = AudioSegment.objects.get(id=segment_id)
+            segment_instance = await AudioSegment.objects.select_related(
+                "audio_file"
+            ).aget(id=segment_id)
             segment_instance.transcription = new_transcription
             if start_time_minutes is not None and end_time_minutes is not None:
                 # Convert minutes to seconds
@@ -399,16 +770,18 @@ class GetAudoji(APIView):
                 end_time_seconds = minutes_to_seconds(end_time_minutes)
 
                 # ==================== Create Audoji ====================
-                created_audoji = AudioRetrieval(
+                created_audoji = await AudioRetrieval(
                     segment_instance, start_time_seconds, end_time_seconds
-                ).create_audoji()
+                ).acreate_audoji()
                 logger.info(f"Audoji edited! {created_audoji}")
 
                 # Refresh to ensure we have the latest data
-                segment_instance.refresh_from_db()
+                segment_instance = await AudioSegment.objects.select_related(
+                    "audio_file"
+                ).aget(id=segment_id)
                 # ==================== Create Audoji ====================
             else:
-                segment_instance.save()
+                await segment_instance.asave()
 
             segment_info = self.format_segment_info(segment_instance)
             return Response(segment_info)
@@ -432,12 +805,12 @@ class GetAudoji(APIView):
             ),
         }
 
-    def handle_delete(self, query_data):
+    async def handle_delete(self, query_data):
         segment_id = query_data.get("id")
 
         try:
-            segment_instance = AudioSegment.objects.get(id=segment_id)
-            segment_instance.delete()
+            segment_instance = await AudioSegment.objects.aget(id=segment_id)
+            await segment_instance.adelete()
             return Response(
                 {"message": "Audio segment deleted successfully"}, status=200
             )
@@ -0,0 +1,66 @@
+import base64
+
+import numpy as np
+
+# Peak buckets drawn by the player: a short clip needs far fewer than a song
+SEGMENT_PEAK_BUCKETS = 256
+FILE_PEAK_BUCKETS = 1024
+PEAK_SCALE = 127  # int8
+
+
+def pcm_samples(audio):
+    """
+    Return a decoded pydub AudioSegment's interleaved samples as a NumPy array,
+    with the sample value that stands for full scale.
+    """
+    # pydub widens 24-bit samples to 32-bit here
+    samples = audio.get_array_of_samples()
+    return (
+        np.frombuffer(samples, dtype=samples.typecode),
+        float(1 << (8 * samples.itemsize - 1)),
+    )
+
+
+def compute_peaks(samples, channels, full_scale, buckets):
+    """
+    Reduce interleaved PCM to ``buckets`` (min, max) pairs as int8 bytes.
+
+    The frames are reshaped into a (buckets x samples per bucket) matrix and
+    reduced along the rows, so every channel of a bucket contributes to its
+    peaks. Up to ``buckets - 1`` trailing frames are dropped to make the shape
+    even; clips shorter than ``buckets`` frames repeat frames instead.
+    """
+    frames = samples.size // channels
+    if frames == 0:
+        return bytes(2 * buckets)
+    if frames < buckets:
+        # One (repeated) frame per bucket
+        frame_index = np.linspace(0, frames - 1, buckets).astype(int)
+        frame_samples = samples[: frames * channels].reshape(frames, channels)
+        samples = frame_samples[frame_index].ravel()
+        frames = buckets
+
+    frames_per_bucket = frames // buckets
+    matrix = samples[: buckets * frames_per_bucket * channels].reshape(buckets, -1)
+    peaks = np.empty((buckets, 2), dtype=np.float64)
+    peaks[:, 0] = matrix.min(axis=1)
+    peaks[:, 1] = matrix.max(axis=1)
+    quantized = np.clip(
+        np.rint(peaks / full_scale * PEAK_SCALE), -PEAK_SCALE, PEAK_SCALE
+    )
+    # Interleaved min0, max0, min1, max1, ...
+    return quantized.astype(np.int8).tobytes()
+
+
+def clip_samples(samples, audio, start, end):
+    """The interleaved samples of ``audio`` between two times in seconds."""
+    first = int(start * audio.frame_rate) * audio.channels
+    last = int(end * audio.frame_rate) * audio.channels
+    return samples[first:last]
+
+
+def encode_peaks(peaks):
+    """API form of stored peaks: base64 of interleaved int8 (min, max) pairs."""
+    if not peaks:
+        return None
+    return base64.b64encode(bytes(peaks)).decode()